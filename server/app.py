@@ -1,55 +1,239 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, current_app, g, request, jsonify, send_from_directory
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
 from flask_bcrypt import Bcrypt
-from datetime import datetime
+from datetime import datetime, timedelta
 from werkzeug.utils import secure_filename
 from flask_cors import CORS
+from sqlalchemy.ext.associationproxy import association_proxy
+from sqlalchemy.ext.compiler import compiles
 import os
+import time
 import uuid
 
-ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg'}
+from batch import run_batch
+from db_routing import ReadWriteRouter, RoutingSession, check_dialect
+from group_commit import GroupCommit
+from idempotency import Idempotency
+from profiling import Profiler, collapsed_stacks
+from rate_limit import RateLimiter
+from resumable import append_chunk, file_sha256, partial_path
+from snapshot import list_snapshots, restore_snapshot, snapshot_folder, snapshot_path, take_snapshot
+from tenancy import TenantRouter, upload_folder
 
-app = Flask(__name__)
-CORS(app, resources={r"/*": {
-    "origins": ["http://localhost:3000", "http://127.0.0.1:3000"], 
-    "supports_credentials": True, 
-    "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], 
-    "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin"]
-}})
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///changeItXD.db'
-app.config['SECRET_KEY'] = 'trzebazmienic'
-app.config['UPLOAD_FOLDER'] = 'uploads'
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
-
-with app.app_context():
-    db.create_all()
+ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg'}
 
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+bcrypt = Bcrypt()
+limiter = RateLimiter()
+router = ReadWriteRouter()
+tenants = TenantRouter()
+idempotency = Idempotency()
+profiler = Profiler()
+group_commit = GroupCommit()
 login_manager = LoginManager()
-login_manager.init_app(app)
+api = Blueprint('api', __name__)
 
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
 
-class Task(db.Model):
+class Assignment(db.Model):
+    # Shared definition of an assignment; every student gets a Task row
+    # pointing here, so editing it is a single UPDATE.
     id = db.Column(db.Integer, primary_key=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     content = db.Column(db.String(200), nullable=False)
+    due_date = db.Column(db.DateTime, nullable=True, index=True)
+    max_points = db.Column(db.Integer, nullable=True)
+    change_seq = db.Column(db.Integer, nullable=True, index=True)
+
+    teacher = db.relationship('User')
+
+    __table_args__ = (
+        db.Index('ix_assignment_teacher_change_seq', 'teacher_id', 'change_seq'),
+    )
+
+class Task(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     completed = db.Column(db.Boolean, default=False)
-    due_date = db.Column(db.DateTime, nullable=True)
     sent_date = db.Column(db.DateTime, nullable=True)
     answer = db.Column(db.String(200), nullable=True)
-    max_points = db.Column(db.Integer, nullable=True)
     grade = db.Column(db.Integer, nullable=True)
     comment = db.Column(db.String(200), nullable=True)
     file_path = db.Column(db.String(255), nullable=True)
-
+    # active_history: track_storage_usage needs the old size even when the
+    # attribute was expired before the new one was set.
+    file_size = db.column_property(db.Column(db.Integer, nullable=True), active_history=True)
+    # Bumped on every insert/update, see bump_change_seq; GET /tasks/changes
+    # walks it through the per-user indexes below.
+    change_seq = db.Column(db.Integer, nullable=True, index=True)
+
+    assignment = db.relationship('Assignment', backref='tasks', lazy='joined', innerjoin=True)
     student = db.relationship('User', foreign_keys=[student_id], backref='tasks')
     teacher = db.relationship('User', foreign_keys=[teacher_id])
 
+    # Task(content=..., due_date=..., max_points=...) still works: the first
+    # of these set on a task without an assignment creates a private one.
+    content = association_proxy('assignment', 'content', creator=lambda value: Assignment(content=value))
+    due_date = association_proxy('assignment', 'due_date', creator=lambda value: Assignment(due_date=value))
+    max_points = association_proxy('assignment', 'max_points', creator=lambda value: Assignment(max_points=value))
+
+    __table_args__ = (
+        db.Index('ix_task_student_change_seq', 'student_id', 'change_seq'),
+        db.Index('ix_task_teacher_change_seq', 'teacher_id', 'change_seq'),
+        db.Index('ix_task_assignment_student', 'assignment_id', 'student_id'),
+    )
+
+class ArchivedTask(db.Model):
+    # Graded tasks from past terms, moved out of `task` by archive.py so the
+    # live table and its indexes only hold current work. Rows keep their
+    # Task id; lookups fall back to this table when a task is not live.
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    completed = db.Column(db.Boolean, default=False)
+    sent_date = db.Column(db.DateTime, nullable=True)
+    answer = db.Column(db.String(200), nullable=True)
+    grade = db.Column(db.Integer, nullable=True)
+    comment = db.Column(db.String(200), nullable=True)
+    file_path = db.Column(db.String(255), nullable=True)
+    file_size = db.Column(db.Integer, nullable=True)
+    # Still part of the change sequence, see change_seq_subquery.
+    change_seq = db.Column(db.Integer, nullable=True, index=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+    assignment = db.relationship('Assignment', lazy='joined', innerjoin=True)
+    student = db.relationship('User', foreign_keys=[student_id])
+    teacher = db.relationship('User', foreign_keys=[teacher_id])
+
+    content = association_proxy('assignment', 'content')
+    due_date = association_proxy('assignment', 'due_date')
+    max_points = association_proxy('assignment', 'max_points')
+
+class greatest(db.FunctionElement):
+    type = db.Integer()
+    inherit_cache = True
+
+@compiles(greatest)
+def compile_greatest(element, compiler, **kw):
+    return f"greatest({compiler.process(element.clauses, **kw)})"
+
+@compiles(greatest, 'sqlite')
+def compile_greatest_sqlite(element, compiler, **kw):
+    # SQLite's max() with several arguments is greatest().
+    return f"max({compiler.process(element.clauses, **kw)})"
+
+# Key of the PostgreSQL advisory lock taken by bump_change_seq.
+CHANGE_SEQ_LOCK = 0x636861
+
+def change_seq_subquery():
+    # Evaluated inside the INSERT/UPDATE itself. Tasks and assignments share
+    # one sequence; the values are unique and follow commit order only while
+    # one writer at a time computes them and commits, see bump_change_seq.
+    # Archived tasks count too: archive.py may move the task holding the
+    # highest number, and the sequence must not go back below cursors that
+    # clients already hold.
+    tables = [Task.__table__.alias(), Assignment.__table__.alias(), ArchivedTask.__table__.alias()]
+    last = [db.func.coalesce(db.select(db.func.max(table.c.change_seq)).scalar_subquery(), 0) for table in tables]
+    return db.select(greatest(*last) + 1).scalar_subquery()
+
+# Built once: a fresh ORM-aliased select per flush costs milliseconds of
+# column adaptation, and the same object keeps the compiled statement cached.
+NEXT_CHANGE_SEQ = change_seq_subquery()
+
+@db.event.listens_for(Assignment, 'before_insert')
+@db.event.listens_for(Assignment, 'before_update')
+@db.event.listens_for(Task, 'before_insert')
+@db.event.listens_for(Task, 'before_update')
+def bump_change_seq(mapper, connection, target):
+    # before_update also fires for rows that are only "dirty" through a
+    # relationship; those did not change for the client.
+    session = db.object_session(target)
+    if target.id is None or session is None or session.is_modified(target, include_collections=False):
+        # SQLite lets one transaction write at a time. On PostgreSQL two
+        # transactions could compute the same max + 1, or commit out of
+        # order and make a cursor skip a change; the advisory lock, held
+        # until commit, serialises them the same way.
+        if connection.dialect.name == 'postgresql':
+            connection.execute(db.select(db.func.pg_advisory_xact_lock(CHANGE_SEQ_LOCK)))
+        target.change_seq = NEXT_CHANGE_SEQ
+
+@db.event.listens_for(Assignment, 'before_insert')
+def default_assignment_teacher(mapper, connection, assignment):
+    # Assignments created implicitly through Task(content=...) belong to the
+    # task's teacher.
+    if assignment.teacher_id is None and assignment.tasks:
+        assignment.teacher_id = assignment.tasks[0].teacher_id
+
+class StorageUsage(db.Model):
+    # Bytes and number of uploaded files per user, kept up to date by
+    # track_storage_usage: a student's own uploads, and for a teacher the
+    # uploads to their tasks. storage.py rebuilds it from file_size.
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True)
+    bytes = db.Column(db.BigInteger, nullable=False, default=0)
+    files = db.Column(db.Integer, nullable=False, default=0)
+
+class UploadSession(db.Model):
+    # A resumable upload (see resumable.py). The random id is the only thing
+    # chunk requests carry, it works like a pre-signed upload URL. No foreign
+    # key to task, like Reminder.
+    id = db.Column(db.String(32), primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    student_id = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    received = db.Column(db.BigInteger, nullable=False, default=0)
+    sha256 = db.Column(db.String(64), nullable=True)
+    updated_at = db.Column(db.DateTime, nullable=False, index=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    def expires_at(self):
+        return self.updated_at + timedelta(seconds=current_app.config['UPLOAD_SESSION_TTL'])
+
+def dialect_insert(connection):
+    # INSERT with ON CONFLICT support for the databases this app runs on
+    # (SUPPORTED_DIALECTS, checked by create_app).
+    if connection.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    elif connection.dialect.name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        raise NotImplementedError(f"Upserts are not supported on {connection.dialect.name}")
+    return insert
+
+def add_storage_usage(connection, user_ids, size, files):
+    usage = StorageUsage.__table__
+    insert = dialect_insert(connection)(usage)
+    connection.execute(
+        insert.on_conflict_do_update(index_elements=[usage.c.user_id], set_={
+            'bytes': usage.c.bytes + insert.excluded.bytes,
+            'files': usage.c.files + insert.excluded.files,
+        }),
+        [{"user_id": user_id, "bytes": size, "files": files} for user_id in user_ids],
+    )
+
+@db.event.listens_for(Task, 'after_insert')
+@db.event.listens_for(Task, 'after_update')
+def track_storage_usage(mapper, connection, task):
+    # Applied in the same transaction as the task row, as an increment, so
+    # concurrent uploads never overwrite each other's totals.
+    history = db.inspect(task).attrs.file_size.history
+    if not history.has_changes():
+        return
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    files = (new is not None) - (old is not None)
+    if (new or 0) != (old or 0) or files:
+        add_storage_usage(connection, {task.student_id, task.teacher_id}, (new or 0) - (old or 0), files)
+
+def find_task(task_id):
+    return db.session.get(Task, task_id) or db.session.get(ArchivedTask, task_id)
+
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False)
@@ -66,18 +250,43 @@ class Log(db.Model):
 
     user = db.relationship('User', backref='logs')
 
+class Reminder(db.Model):
+    # One row per reminder sent by reminders.py; the unique key is what keeps
+    # a reminder from going out twice. No foreign key to task: archived
+    # tasks leave the table while their reminders stay.
+    id = db.Column(db.Integer, primary_key=True)
+    task_id = db.Column(db.Integer, nullable=False)
+    lead = db.Column(db.Integer, nullable=False)  # seconds before due_date
+    sent_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('task_id', 'lead', name='uq_reminder_task_lead'),
+    )
+
 def log_action(user_id, action):
     user = User.query.get(user_id)
     new_log = Log(user_id=user_id, action=f"{user.name} {user.surname}, " + action)
     db.session.add(new_log)
     db.session.commit()
 
-@app.route('/', defaults={'path': ''}, methods=['OPTIONS'])
-@app.route('/<path:path>', methods=['OPTIONS'])
+@api.route('/', defaults={'path': ''}, methods=['OPTIONS'])
+@api.route('/<path:path>', methods=['OPTIONS'])
 def options_handler(path):
     return jsonify({}), 200
 
-@app.route('/login', methods=['POST'])
+@api.route('/batch', methods=['POST'])
+def batch():
+    data = request.json or {}
+    items = data.get('requests')
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"message": "Missing requests"}), 400
+    if len(items) > current_app.config['BATCH_MAX_REQUESTS']:
+        return jsonify({"message": f"At most {current_app.config['BATCH_MAX_REQUESTS']} requests per batch"}), 400
+
+    return jsonify({"responses": run_batch(items, parallel=bool(data.get('parallel')))})
+
+@api.route('/login', methods=['POST'])
 def login():
     data = request.json
     user = User.query.filter_by(email=data['email']).first()
@@ -87,7 +296,7 @@ def login():
         return jsonify({"message": "Login successful", "user": {"id": user.id, "name": user.name, "role": user.role}})
     return jsonify({"message": "Invalid credentials"}), 401
 
-@app.route('/register', methods=['POST'])
+@api.route('/register', methods=['POST'])
 def register():
     data = request.json
     existing_user = User.query.filter_by(email=data['email']).first()
@@ -107,58 +316,106 @@ def register():
     log_action(new_user.id, "Registered")
     return jsonify({"message": "User registered successfully"}), 201
 
-@app.route('/logout', methods=['POST'])
+@api.route('/logout', methods=['POST'])
 def logout():
     logout_user()
     return jsonify({"message": "Logout successful"}), 200
 
-@app.route('/students', methods=['GET'])
+@api.route('/students', methods=['GET'])
 def get_students():
     students = User.query.filter_by(role='student').all()
     student_list = [{"id": student.id, "name": f"{student.name} {student.surname}"} for student in students]
     return jsonify(student_list)
 
-@app.route('/tasks', methods=['GET'])
+def task_summary(task, role):
+    summary = {
+        "id": task.id,
+        "content": task.content,
+        "due_date": task.due_date.strftime("%Y-%m-%d") if task.due_date else None,
+        "answer": task.answer if task.answer else None,
+        "completed": task.completed,
+        "max_points": task.max_points,
+        "grade": task.grade,
+        "file_path": task.file_path if task.file_path else None,
+        "archived": isinstance(task, ArchivedTask),
+    }
+    if role == 'teacher':
+        summary["student_name"] = f"{task.student.name} {task.student.surname}"
+    else:
+        summary["teacher_name"] = f"{task.teacher.name} {task.teacher.surname}"
+    return summary
+
+@api.route('/tasks', methods=['GET'])
 def get_tasks():
     user_id = request.args.get('user_id')
     role = request.args.get('role')
-    task_list = []
     
     if not user_id or not role:
         return jsonify({"message": "Missing user_id or role parameter"}), 400
         
     if role == 'teacher':
         tasks = Task.query.filter_by(teacher_id=user_id).all()
-        task_list = [{
-        "id": task.id,
-        "content": task.content,
-        "due_date": task.due_date.strftime("%Y-%m-%d") if task.due_date else None,
-        "answer": task.answer if task.answer else None,
-        "completed": task.completed,
-        "max_points": task.max_points,
-        "grade": task.grade,
-        "file_path": task.file_path if task.file_path else None,
-        "student_name": f"{task.student.name} {task.student.surname}"
-    } for task in tasks]
     elif role == 'student':
         tasks = Task.query.filter_by(student_id=user_id).all()
-        task_list = [{
-        "id": task.id,
-        "content": task.content,
-        "due_date": task.due_date.strftime("%Y-%m-%d") if task.due_date else None,
-        "answer": task.answer if task.answer else None,
-        "completed": task.completed,
-        "max_points": task.max_points,
-        "grade": task.grade,
-        "file_path": task.file_path if task.file_path else None,
-        "teacher_name": f"{task.teacher.name} {task.teacher.surname}"
-    } for task in tasks]
     else:
         return jsonify({"message": "Invalid role"}), 400
 
+    if request.args.get('include_archived', 'true') != 'false':
+        owner = ArchivedTask.teacher_id if role == 'teacher' else ArchivedTask.student_id
+        tasks += ArchivedTask.query.filter(owner == user_id).order_by(ArchivedTask.id).all()
+
+    task_list = [task_summary(task, role) for task in tasks]
     return jsonify(task_list)
 
-@app.route('/tasks', methods=['POST'])
+@api.route('/tasks/changes', methods=['GET'])
+def get_task_changes():
+    user_id = request.args.get('user_id')
+    role = request.args.get('role')
+
+    if not user_id or not role:
+        return jsonify({"message": "Missing user_id or role parameter"}), 400
+
+    try:
+        since = int(request.args.get('since', 0))
+        limit = min(int(request.args.get('limit', 100)), 500)
+    except ValueError:
+        return jsonify({"message": "Invalid since or limit parameter"}), 400
+
+    if role == 'teacher':
+        owner = Task.teacher_id
+    elif role == 'student':
+        owner = Task.student_id
+    else:
+        return jsonify({"message": "Invalid role"}), 400
+
+    # A task changed when its own row or its assignment got a newer sequence
+    # number. Each half of the union is an index range scan over the changes.
+    changed = db.union(
+        db.select(Task.id).where(owner == user_id, Task.change_seq > since),
+        db.select(Task.id).join(Task.assignment).where(Assignment.change_seq > since, owner == user_id),
+    )
+    seq = greatest(Task.change_seq, Assignment.change_seq)
+    query = (db.session.query(Task, seq)
+             .join(Task.assignment)
+             .options(db.contains_eager(Task.assignment))
+             .filter(Task.id.in_(changed)))
+
+    rows = query.order_by(seq, Task.id).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    page = rows[:limit]
+    if has_more and rows[limit][1] == page[-1][1]:
+        # One assignment edit gives all of its tasks the same number; the page
+        # must not end inside such a group or the rest would be skipped.
+        task, last = page[-1]
+        page += query.filter(seq == last, Task.id > task.id).order_by(Task.id).all()
+
+    return jsonify({
+        "tasks": [task_summary(task, role) for task, _ in page],
+        "cursor": page[-1][1] if page else since,
+        "has_more": has_more
+    })
+
+@api.route('/tasks', methods=['POST'])
 def create_task():
     data = request.json
     teacher_id = data.get('teacher_id')
@@ -185,7 +442,105 @@ def create_task():
     db.session.commit()
     return jsonify({"message": "Task created successfully"}), 201
 
-@app.route('/task/complete/<int:task_id>', methods=['POST'])
+@api.route('/assignments', methods=['POST'])
+def create_assignment():
+    data = request.json
+    teacher_id = data.get('teacher_id')
+    student_ids = set(data.get('student_ids') or [])
+
+    if not teacher_id or not student_ids:
+        return jsonify({"message": "Missing teacher_id or student_ids parameter"}), 400
+
+    teacher = User.query.filter_by(id=teacher_id, role='teacher').first()
+    if not teacher:
+        return jsonify({"message": "Teacher not found"}), 404
+
+    found = User.query.filter(User.id.in_(student_ids), User.role == 'student').count()
+    if found != len(student_ids):
+        return jsonify({"message": "Student not found"}), 404
+
+    assignment = Assignment(
+        teacher_id=teacher_id,
+        content=data['content'],
+        due_date=datetime.strptime(data['due_date'], "%Y-%m-%d"),
+        max_points=data['max_points']
+    )
+    db.session.add(assignment)
+    db.session.add_all([
+        Task(assignment=assignment, student_id=student_id, teacher_id=teacher_id)
+        for student_id in sorted(student_ids)
+    ])
+    db.session.commit()
+    return jsonify({"message": "Assignment created successfully", "assignment_id": assignment.id}), 201
+
+@api.route('/assignments/<int:assignment_id>', methods=['PUT'])
+def update_assignment(assignment_id):
+    data = request.json
+    teacher_id = data.get('teacher_id')
+
+    if not teacher_id:
+        return jsonify({"message": "Missing teacher_id parameter"}), 400
+
+    assignment = db.session.get(Assignment, assignment_id)
+    if not assignment or assignment.teacher_id != int(teacher_id):
+        return jsonify({"message": "Unauthorized or assignment not found"}), 403
+
+    if 'content' in data:
+        assignment.content = data['content']
+    if 'due_date' in data:
+        assignment.due_date = datetime.strptime(data['due_date'], "%Y-%m-%d")
+    if 'max_points' in data:
+        assignment.max_points = data['max_points']
+    db.session.commit()
+    return jsonify({"message": "Assignment updated successfully"}), 200
+
+@api.route('/assignments', methods=['GET'])
+def get_assignments():
+    teacher_id = request.args.get('teacher_id')
+
+    if not teacher_id:
+        return jsonify({"message": "Missing teacher_id parameter"}), 400
+
+    # Per-assignment statistics for the whole list in one grouped query,
+    # archived tasks included.
+    tasks = db.union_all(
+        db.select(Task.id, Task.assignment_id, Task.completed, Task.grade)
+        .where(Task.teacher_id == teacher_id),
+        db.select(ArchivedTask.id, ArchivedTask.assignment_id, ArchivedTask.completed, ArchivedTask.grade)
+        .where(ArchivedTask.teacher_id == teacher_id),
+    ).subquery()
+    rows = (db.session.query(
+                Assignment,
+                db.func.count(tasks.c.id),
+                db.func.count(db.case((tasks.c.completed, 1))),
+                db.func.count(tasks.c.grade),
+                db.func.avg(tasks.c.grade))
+            .outerjoin(tasks, tasks.c.assignment_id == Assignment.id)
+            .filter(Assignment.teacher_id == teacher_id)
+            .group_by(Assignment.id)
+            .order_by(Assignment.id)
+            .all())
+
+    return jsonify([{
+        "id": assignment.id,
+        "content": assignment.content,
+        "due_date": assignment.due_date.strftime("%Y-%m-%d") if assignment.due_date else None,
+        "max_points": assignment.max_points,
+        "students": students,
+        "completed": completed,
+        "graded": graded,
+        "average_grade": round(average, 2) if average is not None else None
+    } for assignment, students, completed, graded, average in rows])
+
+def commit_grouped(write):
+    # Submission writes go through the group committer (group_commit.py).
+    # The request's own session ends its read transaction first, which also
+    # expires the objects the write is about to change.
+    engine = db.session.get_bind()
+    db.session.rollback()
+    return group_commit.submit(engine, write)
+
+@api.route('/task/complete/<int:task_id>', methods=['POST'])
 def mark_task_completed(task_id):
     data = request.json
     student_id = data.get('student_id')
@@ -199,15 +554,21 @@ def mark_task_completed(task_id):
 
     if not data.get('answer'):
         return jsonify({"message": "Answer is required"}), 400
-        
-    task.answer = data.get('answer', None)
-    task.sent_date = datetime.now()
-    task.completed = True
 
-    db.session.commit()
+    def complete(session):
+        task = session.get(Task, task_id)
+        if not task:
+            return False
+        task.answer = data.get('answer', None)
+        task.sent_date = datetime.now()
+        task.completed = True
+        return True
+
+    if not commit_grouped(complete):
+        return jsonify({"message": "Unauthorized or task not found"}), 403
     return jsonify({"message": "Task marked as completed"}), 200
 
-@app.route('/task/grade/<int:task_id>', methods=['POST'])
+@api.route('/task/grade/<int:task_id>', methods=['POST'])
 def grade_task(task_id):
     data = request.json
     teacher_id = data.get('teacher_id')
@@ -229,7 +590,7 @@ def grade_task(task_id):
 
     return jsonify({"message": "Invalid action"}), 400
 
-@app.route('/logs', methods=['GET'])
+@api.route('/logs', methods=['GET'])
 def get_logs():
     admin_id = request.args.get('admin_id')
     
@@ -250,7 +611,7 @@ def get_logs():
 
     return jsonify(log_list)
 
-@app.route('/upload/<int:task_id>', methods=['POST'])
+@api.route('/upload/<int:task_id>', methods=['POST'])
 def upload_file(task_id):
     student_id = request.form.get('student_id')
     
@@ -270,23 +631,185 @@ def upload_file(task_id):
 
     if file and allowed_file(file.filename):
         filename = secure_filename(f"{task_id}_{student_id}_{file.filename}")
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        file_path = os.path.join(upload_folder(), filename)
         
-        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+        os.makedirs(upload_folder(), exist_ok=True)
 
         file.save(file_path)
 
-        task.file_path = file_path
-        db.session.commit()
+        file_size = os.path.getsize(file_path)
+
+        def attach(session):
+            task = session.get(Task, task_id)
+            if not task:
+                return False
+            task.file_path = file_path
+            task.file_size = file_size
+            return True
+
+        if not commit_grouped(attach):
+            return jsonify({"message": "Task not found or not assigned to you"}), 404
         return jsonify({"message": "File uploaded", "filename": filename}), 200
 
     return jsonify({"message": "Invalid file type"}), 400
 
-@app.route('/uploads/<path:filepath>')
+def upload_session_summary(upload):
+    return {
+        "upload_id": upload.id,
+        "offset": upload.received,
+        "size": upload.size,
+        "expires_at": upload.expires_at().strftime("%Y-%m-%d %H:%M:%S"),
+        "completed": upload.completed_at is not None
+    }
+
+def find_upload_session(upload_id):
+    upload = db.session.get(UploadSession, upload_id)
+    if upload is None or upload.expires_at() < datetime.now():
+        return None
+    return upload
+
+@api.route('/upload/<int:task_id>/session', methods=['POST'])
+def create_upload_session(task_id):
+    data = request.json
+    student_id = data.get('student_id')
+
+    if not student_id:
+        return jsonify({"message": "Missing student_id parameter"}), 400
+
+    task = Task.query.filter_by(id=task_id, student_id=student_id).first()
+    if not task:
+        return jsonify({"message": "Task not found or not assigned to you"}), 404
+
+    filename = data.get('filename') or ''
+    if not allowed_file(filename):
+        return jsonify({"message": "Invalid file type"}), 400
+
+    size = data.get('size')
+    if not isinstance(size, int) or size <= 0:
+        return jsonify({"message": "Invalid file size"}), 400
+    if size > current_app.config['UPLOAD_MAX_SIZE']:
+        return jsonify({"message": "File too large"}), 413
+
+    sha256 = data.get('sha256')
+    if sha256 is not None and (not isinstance(sha256, str) or len(sha256) != 64):
+        return jsonify({"message": "Invalid sha256"}), 400
+
+    upload = UploadSession(id=uuid.uuid4().hex, task_id=task.id, student_id=task.student_id, filename=filename,
+                           size=size, received=0, sha256=sha256.lower() if sha256 else None,
+                           updated_at=datetime.now())
+    path = partial_path(upload.id)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'wb').close()
+    db.session.add(upload)
+    db.session.commit()
+    return jsonify(upload_session_summary(upload)), 201
+
+@api.route('/upload/session/<upload_id>', methods=['GET'])
+def get_upload_session(upload_id):
+    upload = find_upload_session(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload session not found"}), 404
+    return jsonify(upload_session_summary(upload))
+
+@api.route('/upload/session/<upload_id>', methods=['PUT'])
+def upload_chunk(upload_id):
+    upload = find_upload_session(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload session not found"}), 404
+    if upload.completed_at:
+        return jsonify({"message": "Upload already completed"}), 409
+
+    offset = request.args.get('offset', type=int)
+    if offset != upload.received:
+        return jsonify({"message": "Offset mismatch", "offset": upload.received}), 409
+    remaining = upload.size - offset
+    if request.content_length is not None and request.content_length > remaining:
+        return jsonify({"message": "Chunk exceeds file size", "offset": offset}), 413
+
+    written, complete = append_chunk(partial_path(upload.id), offset, request.stream, remaining)
+
+    # Conditional on the offset: of two requests racing for the same range
+    # only one moves the session forward.
+    updated = UploadSession.query.filter_by(id=upload.id, received=offset).update(
+        {"received": offset + written, "updated_at": datetime.now()})
+    db.session.commit()
+    if not updated:
+        db.session.refresh(upload)
+        return jsonify({"message": "Offset mismatch", "offset": upload.received}), 409
+    if not complete:
+        return jsonify({"message": "Upload interrupted", "offset": offset + written}), 400
+    return jsonify({"offset": offset + written})
+
+@api.route('/upload/session/<upload_id>/complete', methods=['POST'])
+def complete_upload_session(upload_id):
+    upload = find_upload_session(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload session not found"}), 404
+
+    filename = secure_filename(f"{upload.task_id}_{upload.student_id}_{upload.filename}")
+    if upload.completed_at:
+        return jsonify({"message": "File uploaded", "filename": filename}), 200
+    if upload.received != upload.size:
+        return jsonify({"message": "Upload incomplete", "offset": upload.received}), 409
+
+    path = partial_path(upload.id)
+    if upload.sha256 and file_sha256(path, upload.size) != upload.sha256:
+        os.remove(path)
+        db.session.delete(upload)
+        db.session.commit()
+        return jsonify({"message": "Checksum mismatch, upload the file again"}), 422
+
+    task = Task.query.filter_by(id=upload.task_id, student_id=upload.student_id).first()
+    if not task:
+        return jsonify({"message": "Task not found or not assigned to you"}), 404
+
+    file_path = os.path.join(upload_folder(), filename)
+    with open(path, 'r+b') as f:
+        f.truncate(upload.size)
+    os.replace(path, file_path)
+
+    task.file_path = file_path
+    task.file_size = upload.size
+    upload.completed_at = datetime.now()
+    db.session.commit()
+    return jsonify({"message": "File uploaded", "filename": filename}), 200
+
+@api.route('/upload/session/<upload_id>', methods=['DELETE'])
+def cancel_upload_session(upload_id):
+    upload = find_upload_session(upload_id)
+    if not upload:
+        return jsonify({"message": "Upload session not found"}), 404
+
+    if not upload.completed_at and os.path.exists(partial_path(upload.id)):
+        os.remove(partial_path(upload.id))
+    db.session.delete(upload)
+    db.session.commit()
+    return jsonify({"message": "Upload cancelled"}), 200
+
+@api.route('/uploads/<path:filepath>')
 def uploaded_file(filepath):
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filepath, as_attachment=True)
+    return send_from_directory(upload_folder(), filepath, as_attachment=True)
+
+@api.route('/storage', methods=['GET'])
+def get_storage_usage():
+    user_id = request.args.get('user_id')
+
+    if not user_id:
+        return jsonify({"message": "Missing user_id parameter"}), 400
 
-@app.route('/task/<int:task_id>', methods=['GET'])
+    user = db.session.get(User, user_id)
+    if not user:
+        return jsonify({"message": "User not found"}), 404
+
+    usage = db.session.get(StorageUsage, user.id)
+    return jsonify({
+        "user_id": user.id,
+        "role": user.role,
+        "bytes": usage.bytes if usage else 0,
+        "files": usage.files if usage else 0
+    })
+
+@api.route('/task/<int:task_id>', methods=['GET'])
 def get_task_details(task_id):
     user_id = request.args.get('user_id')
     role = request.args.get('role')
@@ -294,7 +817,7 @@ def get_task_details(task_id):
     if not user_id or not role:
         return jsonify({"message": "Missing user_id or role parameter"}), 400
     
-    task = Task.query.get(task_id)
+    task = find_task(task_id)
     if not task:
         return jsonify({"message": "Task not found"}), 404
     
@@ -316,7 +839,8 @@ def get_task_details(task_id):
         "comment": task.comment,
         "file_path": task.file_path,
         "student_name": f"{task.student.name} {task.student.surname}",
-        "teacher_name": f"{task.teacher.name} {task.teacher.surname}"
+        "teacher_name": f"{task.teacher.name} {task.teacher.surname}",
+        "archived": isinstance(task, ArchivedTask)
     }
     
     return jsonify(task_data)
@@ -324,14 +848,160 @@ def get_task_details(task_id):
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
-@app.route('/clear_db', methods=['POST'])
+def find_admin(admin_id):
+    return User.query.filter_by(id=admin_id, role='admin').first() if admin_id else None
+
+@api.route('/snapshots', methods=['GET'])
+def get_snapshots():
+    if not find_admin(request.args.get('admin_id')):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    folder = snapshot_folder(current_app, g.get('tenant'))
+    return jsonify([{
+        "name": snapshot["name"],
+        "size": snapshot["size"],
+        "created": datetime.fromtimestamp(snapshot["created"]).strftime("%Y-%m-%d %H:%M:%S")
+    } for snapshot in list_snapshots(folder)])
+
+@api.route('/snapshots', methods=['POST'])
+def create_snapshot():
+    data = request.json
+    if not find_admin(data.get('admin_id')):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    try:
+        path = snapshot_path(snapshot_folder(current_app, g.get('tenant')), data.get('name'))
+    except ValueError:
+        return jsonify({"message": "Invalid snapshot name"}), 400
+
+    # The admin lookup above opened a read transaction on this session's
+    # connection; the backup runs on a connection of its own.
+    engine = db.session.get_bind()
+    db.session.rollback()
+    start = time.perf_counter()
+    size = take_snapshot(engine, path)
+    return jsonify({"message": "Snapshot created", "name": data['name'], "size": size,
+                    "seconds": round(time.perf_counter() - start, 3)}), 201
+
+@api.route('/snapshots/<name>/restore', methods=['POST'])
+def restore_database(name):
+    data = request.json
+    if not find_admin(data.get('admin_id')):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    try:
+        path = snapshot_path(snapshot_folder(current_app, g.get('tenant')), name)
+    except ValueError:
+        return jsonify({"message": "Invalid snapshot name"}), 400
+    if not os.path.isfile(path):
+        return jsonify({"message": "Snapshot not found"}), 404
+
+    engine = db.session.get_bind()
+    db.session.rollback()
+    start = time.perf_counter()
+    restore_snapshot(engine, path)
+    return jsonify({"message": "Database restored", "name": name,
+                    "seconds": round(time.perf_counter() - start, 3)}), 200
+
+@api.route('/profiles', methods=['GET'])
+def get_profiles():
+    if not find_admin(request.args.get('admin_id')):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    return jsonify([{
+        "id": profile["id"],
+        "trigger": profile["trigger"],
+        "method": profile["method"],
+        "path": profile["path"],
+        "status": profile["status"],
+        "started": profile["started"],
+        "duration_ms": profile["duration_ms"],
+        "samples": profile["samples"],
+        "sql_count": len(profile["sql"]),
+        "sql_ms": profile["sql_ms"]
+    } for profile in current_app.extensions['profiler'].store_for(g.get('tenant')).list()])
+
+@api.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    if not find_admin(request.args.get('admin_id')):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    profile = current_app.extensions['profiler'].store_for(g.get('tenant')).get(profile_id)
+    if profile is None:
+        return jsonify({"message": "Profile not found"}), 404
+    return jsonify(profile)
+
+@api.route('/profiles/<profile_id>/flamegraph', methods=['GET'])
+def get_profile_flamegraph(profile_id):
+    if not find_admin(request.args.get('admin_id')):
+        return jsonify({"message": "Unauthorized"}), 403
+
+    profile = current_app.extensions['profiler'].store_for(g.get('tenant')).get(profile_id)
+    if profile is None:
+        return jsonify({"message": "Profile not found"}), 404
+    return current_app.response_class(collapsed_stacks(profile), mimetype='text/plain', headers={
+        "Content-Disposition": f"attachment; filename=profile-{profile_id}.folded"})
+
+@api.route('/clear_db', methods=['POST'])
 def clear_db():
+    # The school's shard (X-School), not the default database.
+    engine = db.session.get_bind()
+    db.session.rollback()
     try:
-        db.drop_all()
-        db.create_all()
+        db.metadata.drop_all(engine)
+        db.metadata.create_all(engine)
         return jsonify({"message": "Database cleared successfully"}), 200
     except Exception as e:
         return jsonify({"message": f"Error clearing database: {str(e)}"}), 500
 
+def create_app(config=None):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///changeItXD.db')
+    app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'trzebazmienic')
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['UPLOAD_MAX_SIZE'] = 100 * 1024 * 1024
+    app.config['UPLOAD_SESSION_TTL'] = 24 * 3600
+    app.config['SNAPSHOT_FOLDER'] = 'snapshots'
+    app.config['BATCH_MAX_REQUESTS'] = 20
+    app.config['BATCH_MAX_WORKERS'] = 4
+    # e.g. sqlite:///file:changeItXD.db?mode=ro&uri=true or a replica URL
+    app.config['SQLALCHEMY_READ_URI'] = os.environ.get('DATABASE_READ_URL')
+    # Shared SQLite files for the rate-limit buckets and idempotency keys;
+    # without them every gunicorn worker keeps its own, and a retry that
+    # lands on another worker runs the handler again.
+    app.config['RATELIMIT_STORAGE_PATH'] = os.environ.get('RATELIMIT_STORAGE_PATH')
+    app.config['IDEMPOTENCY_STORAGE_PATH'] = os.environ.get('IDEMPOTENCY_STORAGE_PATH')
+    # e.g. shards.json (relative to the instance folder), see tenancy.py
+    app.config['TENANT_SHARD_MAP'] = os.environ.get('TENANT_SHARD_MAP')
+    if config:
+        app.config.from_mapping(config)
+    check_dialect(app.config['SQLALCHEMY_DATABASE_URI'])
+
+    CORS(app, resources={r"/*": {
+        "origins": ["http://localhost:3000", "http://127.0.0.1:3000"], 
+        "supports_credentials": True, 
+        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"], 
+        "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "Accept", "Origin", "X-School", "Idempotency-Key", "X-Profile"]
+    }})
+    db.init_app(app)
+    bcrypt.init_app(app)
+    # The limiter keys its buckets by school, so tenants selects the shard
+    # first.
+    tenants.init_app(app)
+    limiter.init_app(app)
+    router.init_app(app)
+    idempotency.init_app(app)
+    profiler.init_app(app, authorize=find_admin)
+    group_commit.init_app(app)
+    login_manager.init_app(app)
+    app.register_blueprint(api)
+    return app
+
+# Nothing here touches the database, so importing this module (tests, WSGI
+# workers) stays cheap. The schema is created by create_tables.py.
+app = create_app()
+
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    with app.app_context():
+        db.create_all()
+    app.run(debug=True)
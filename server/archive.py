@@ -0,0 +1,106 @@
+import argparse
+import time
+from datetime import datetime
+
+import sqlalchemy as sa
+
+from app import app, db, ArchivedTask, Assignment, Task
+
+# Moves graded tasks whose assignment was due before a cutoff from `task` to
+# `archived_task`. Every batch is its own short transaction, so live requests
+# only ever wait for one batch.
+#
+#   python archive.py --before 2025-02-01
+#   python archive.py --before 2025-02-01 --school szkola-a
+
+
+def archive_graded_tasks(engine, before, batch_size=500, pause=0.0):
+    task = Task.__table__
+    archived = ArchivedTask.__table__
+    columns = [column.name for column in task.columns]
+    archived_at = datetime.now()
+    moved = 0
+    last_id = 0
+
+    while True:
+        with engine.begin() as conn:
+            # The newest task always stays: SQLite hands out max(id) + 1 as the
+            # next id, which must never collide with an archived id.
+            newest = conn.execute(sa.select(sa.func.max(task.c.id))).scalar()
+            ids = conn.execute(
+                sa.select(task.c.id)
+                .join(Assignment.__table__, Assignment.__table__.c.id == task.c.assignment_id)
+                .where(task.c.id > last_id, task.c.id < newest,
+                       task.c.grade.is_not(None), Assignment.__table__.c.due_date < before)
+                .order_by(task.c.id)
+                .limit(batch_size)
+            ).scalars().all()
+            if not ids:
+                return moved
+            # change_seq moves along: the next sequence number still counts
+            # archived rows (change_seq_subquery in app.py).
+            conn.execute(archived.insert().from_select(
+                columns + ['archived_at'],
+                sa.select(*[task.c[name] for name in columns], sa.literal(archived_at)).where(task.c.id.in_(ids)),
+            ))
+            conn.execute(task.delete().where(task.c.id.in_(ids)))
+        moved += len(ids)
+        last_id = ids[-1]
+        if pause:
+            time.sleep(pause)
+
+
+def table_size(engine, table):
+    # Rows plus bytes used by the table and its indexes; bytes need the
+    # dbstat virtual table (SQLite only) and are None when it is missing.
+    with engine.connect() as conn:
+        rows = conn.execute(sa.select(sa.func.count()).select_from(sa.table(table))).scalar()
+        names = [table] + [index['name'] for index in sa.inspect(conn).get_indexes(table)]
+        try:
+            size = conn.execute(
+                sa.text("SELECT sum(pgsize) FROM dbstat WHERE name IN :names")
+                .bindparams(sa.bindparam('names', expanding=True)),
+                {'names': names},
+            ).scalar()
+        except sa.exc.DBAPIError:
+            size = None
+    return rows, size
+
+
+def report(label, rows, size):
+    size = f"{size / 1024:.0f} KiB" if size is not None else "n/a"
+    print(f"  {label:18} {rows:>10} rows {size:>14}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive graded tasks from past terms")
+    parser.add_argument('--before', required=True, help="archive tasks due before this date (YYYY-MM-DD)")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--pause', type=float, default=0.0, help="seconds to sleep between batches")
+    parser.add_argument('--school', help="shard to archive when TENANT_SHARD_MAP is set")
+    args = parser.parse_args()
+    before = datetime.strptime(args.before, "%Y-%m-%d")
+
+    with app.app_context():
+        if args.school:
+            state = app.extensions['tenancy']
+            engine = state.engine_for(state.shards.get(args.school)['uri'])
+        else:
+            engine = db.engine
+
+        hot_before = table_size(engine, 'task')
+        start = time.perf_counter()
+        moved = archive_graded_tasks(engine, before, args.batch_size, args.pause)
+        elapsed = time.perf_counter() - start
+        hot_after = table_size(engine, 'task')
+
+        print(f"Archived {moved} tasks due before {args.before} in {elapsed:.2f} s")
+        report("task before", *hot_before)
+        report("task after", *hot_after)
+        report("archived_task", *table_size(engine, 'archived_task'))
+        if hot_before[1] and hot_after[1] is not None:
+            print(f"  hot table shrank by {100 * (1 - hot_after[1] / hot_before[1]):.1f}%")
+
+
+if __name__ == '__main__':
+    main()
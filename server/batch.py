@@ -0,0 +1,66 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, request
+from werkzeug.test import EnvironBuilder
+
+# POST /batch runs several GET requests of this API in one HTTP round trip.
+# Every sub-request goes through the normal dispatch (before_request hooks,
+# rate limits, tenancy, error handlers) with the caller's headers, so it sees
+# exactly what a separate request would.
+
+# Headers describing the batch body itself, not the sub-requests. X-Profile
+# profiles the batch as a whole, sub-requests show up in its stacks.
+SKIPPED_HEADERS = {'content-type', 'content-length', 'idempotency-key', 'x-profile'}
+
+
+def run_batch(items, parallel=False):
+    app = current_app._get_current_object()
+    headers = [(name, value) for name, value in request.headers if name.lower() not in SKIPPED_HEADERS]
+    base = {'REMOTE_ADDR': request.remote_addr}
+
+    if not parallel or len(items) == 1:
+        # Sequential sub-requests share this request's app context, and with
+        # it the database session and connection.
+        return [dispatch(app, item, headers, base) for item in items]
+
+    def dispatch_in_context(item):
+        # Each thread has its own app context and so its own session.
+        with app.app_context():
+            return dispatch(app, item, headers, base)
+
+    with ThreadPoolExecutor(max_workers=min(len(items), app.config['BATCH_MAX_WORKERS'])) as pool:
+        return list(pool.map(dispatch_in_context, items))
+
+
+def dispatch(app, item, headers, base):
+    if not isinstance(item, dict) or not str(item.get('path', '')).startswith('/'):
+        return result(item, 400, {"message": "Invalid sub-request"})
+    if str(item.get('method', 'GET')).upper() != 'GET':
+        return result(item, 405, {"message": "Only GET requests can be batched"})
+
+    path, _, query = item['path'].partition('?')
+    environ = EnvironBuilder(path=path, query_string=query, method='GET', headers=headers,
+                             environ_base=base).get_environ()
+    with app.request_context(environ):
+        try:
+            response = app.full_dispatch_request()
+        except Exception:
+            # A failed sub-request must not poison the session the others
+            # share.
+            app.log_exception(sys.exc_info())
+            app.extensions['sqlalchemy'].session.rollback()
+            return result(item, 500, {"message": "Internal server error"})
+        try:
+            # Only JSON bodies are inlined; file downloads keep their own
+            # endpoint.
+            return result(item, response.status_code, response.get_json() if response.is_json else None)
+        finally:
+            response.close()
+
+
+def result(item, status, body):
+    entry = {"status": status, "body": body}
+    if isinstance(item, dict) and 'id' in item:
+        entry["id"] = item['id']
+    return entry
@@ -0,0 +1,84 @@
+import sys
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+# The last minutes before a due date: WRITERS threads (one gunicorn worker
+# with that many threads) each submit SUBMISSIONS answers as fast as they can.
+
+WRITERS = int(os.environ.get('BENCH_WRITERS', 32))
+SUBMISSIONS = int(os.environ.get('BENCH_SUBMISSIONS', 25))
+
+
+def seed(engine, students, tasks_each):
+    from app import db, Assignment, Task, User
+
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": i + 1, "name": "Uczen", "surname": str(i), "email": f"s{i}", "password": "x",
+             "role": "teacher" if i == 0 else "student"} for i in range(students + 1)])
+        conn.execute(Assignment.__table__.insert(), [
+            {"id": 1, "teacher_id": 1, "content": "Projekt", "due_date": datetime(2030, 1, 1), "max_points": 10}])
+        conn.execute(Task.__table__.insert(), [
+            {"id": i + 1, "assignment_id": 1, "student_id": i // tasks_each + 2, "teacher_id": 1}
+            for i in range(students * tasks_each)])
+
+
+def burst(uri, grouped):
+    from app import create_app, db
+
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': uri,
+        'RATELIMIT_ENABLED': False,
+        'GROUP_COMMIT_ENABLED': grouped,
+        # Every writer may hold a connection, as with a pool sized for the
+        # worker's threads.
+        'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': WRITERS, 'max_overflow': 0},
+    })
+    with app.app_context():
+        seed(db.engine, WRITERS, SUBMISSIONS)
+
+    latencies, errors = [], []
+    barrier = threading.Barrier(WRITERS + 1)
+
+    def writer(student):
+        client = app.test_client()
+        barrier.wait()
+        for i in range(SUBMISSIONS):
+            task_id = student * SUBMISSIONS + i + 1
+            start = time.perf_counter()
+            response = client.post(f'/task/complete/{task_id}', json={"student_id": student + 2, "answer": "Odpowiedz"})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    threads = [threading.Thread(target=writer, args=(i,)) for i in range(WRITERS)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    with app.app_context():
+        db.engine.dispose()
+
+    latencies.sort()
+    mean = sum(latencies) / len(latencies)
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[int(len(latencies) * 0.99)]
+    return len(latencies) / elapsed, mean, p50, p99, len(errors)
+
+
+if __name__ == '__main__':
+    print(f"{WRITERS} writers x {SUBMISSIONS} submissions")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, grouped in (("commit per request", False), ("group commit", True)):
+            uri = f"sqlite:///{os.path.join(tmp, f'{label[0]}.db')}"
+            throughput, mean, p50, p99, errors = burst(uri, grouped)
+            print(f"{label:20} {throughput:6.0f} req/s   mean {mean * 1e3:6.1f} ms   p50 {p50 * 1e3:6.1f} ms   "
+                  f"p99 {p99 * 1e3:7.1f} ms   errors {errors}")
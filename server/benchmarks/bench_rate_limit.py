@@ -0,0 +1,61 @@
+import sys
+import os
+import tempfile
+import threading
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from rate_limit import MemoryBucketStore, SqliteBucketStore
+
+RATE = 1000.0
+BURST = 1000.0
+
+
+def bench_store(store, calls, keys):
+    names = [f"get_tasks|u:{i}" for i in range(keys)]
+    start = time.perf_counter()
+    for i in range(calls):
+        store.take(names[i % keys], RATE, BURST)
+    return (time.perf_counter() - start) / calls
+
+
+def bench_threads(store, threads, calls, keys):
+    def worker(offset):
+        names = [f"get_tasks|u:{offset}-{i}" for i in range(keys)]
+        for i in range(calls):
+            store.take(names[i % keys], RATE, BURST)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    return (time.perf_counter() - start) / (threads * calls)
+
+
+def bench_requests(calls):
+    from app import app, limiter
+
+    def run(path, method):
+        with app.test_request_context(path, method=method):
+            start = time.perf_counter()
+            for _ in range(calls):
+                limiter._check()
+            return (time.perf_counter() - start) / calls
+
+    state = app.extensions['rate_limiter']
+    state.store = MemoryBucketStore()
+    state.limits['api.login'] = (1e9, 1e9)
+    return run('/students', 'GET'), run('/login', 'POST')
+
+
+if __name__ == '__main__':
+    print(f"memory store, 1 key:          {bench_store(MemoryBucketStore(), 1000000, 1) * 1e9:8.0f} ns/take")
+    print(f"memory store, 10k keys:       {bench_store(MemoryBucketStore(), 1000000, 10000) * 1e9:8.0f} ns/take")
+    print(f"memory store, 8 threads:      {bench_threads(MemoryBucketStore(), 8, 100000, 1000) * 1e9:8.0f} ns/take")
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SqliteBucketStore(os.path.join(tmp, "buckets.db"))
+        print(f"sqlite store, 10k keys:       {bench_store(store, 20000, 10000) * 1e9:8.0f} ns/take")
+    unlimited, limited = bench_requests(200000)
+    print(f"hook, unlimited endpoint:     {unlimited * 1e9:8.0f} ns/request")
+    print(f"hook, limited endpoint:       {limited * 1e9:8.0f} ns/request")
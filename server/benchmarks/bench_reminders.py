@@ -0,0 +1,82 @@
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+
+NOW = datetime(2030, 1, 10, 12, 0)
+STUDENTS_PER_ASSIGNMENT = 25
+
+
+def build(engine, total, upcoming):
+    # `total` tasks, of which `upcoming` are due within the next day; the rest
+    # are spread over past years and the far future.
+    from app import db, Assignment, Task, User
+
+    db.metadata.create_all(engine)
+    assignments, tasks = [], []
+    for i in range(0, total, STUDENTS_PER_ASSIGNMENT):
+        assignment_id = len(assignments) + 1
+        if i < upcoming:
+            due = NOW + timedelta(minutes=30 + (i * 37) % (23 * 60))
+        elif i % 2:
+            due = NOW - timedelta(days=1 + i % 1500)
+        else:
+            due = NOW + timedelta(days=30 + i % 300)
+        assignments.append({"id": assignment_id, "teacher_id": 1, "content": f"Zadanie {i}", "due_date": due})
+        for j in range(i, min(i + STUDENTS_PER_ASSIGNMENT, total)):
+            tasks.append({"id": j + 1, "assignment_id": assignment_id, "student_id": 2, "teacher_id": 1,
+                          "completed": j >= upcoming and j % 3 == 0})
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), [
+            {"id": 1, "name": "Jan", "surname": "Nowak", "email": "t", "password": "x", "role": "teacher"},
+            {"id": 2, "name": "Anna", "surname": "Kowalska", "email": "s", "password": "x", "role": "student"},
+        ])
+        conn.execute(Assignment.__table__.insert(), assignments)
+        conn.execute(Task.__table__.insert(), tasks)
+
+
+def time_call(fn, runs=5):
+    best = float('inf')
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def full_scan(engine):
+    # What a naive cron does: every open task, filtered in Python.
+    from app import Assignment, Task
+
+    task, assignment = Task.__table__, Assignment.__table__
+    horizon = NOW + timedelta(days=1, minutes=1)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            sa.select(task.c.id, assignment.c.due_date)
+            .select_from(task.join(assignment))
+            .where(task.c.completed.is_not(True))
+        ).all()
+    return sum(1 for _, due in rows if NOW < due <= horizon)
+
+
+if __name__ == '__main__':
+    from reminders import ReminderScheduler
+
+    print(f"{'tasks':>8} {'upcoming':>9} {'refill':>10} {'tick':>10} {'full scan':>11} {'heap':>6}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for total in (10_000, 100_000, 400_000):
+            for upcoming in (100, 2_000):
+                engine = sa.create_engine(f"sqlite:///{os.path.join(tmp, f'{total}_{upcoming}.db')}")
+                build(engine, total, upcoming)
+                scheduler = ReminderScheduler(engine, sink=lambda events: None)
+                refill, heap = time_call(lambda: scheduler.refill(NOW))
+                # Sends the reminders due right now, then a steady-state tick.
+                scheduler.tick(NOW)
+                tick, _ = time_call(lambda: scheduler.tick(NOW + timedelta(seconds=1)))
+                scan, _ = time_call(lambda: full_scan(engine), runs=3)
+                print(f"{total:>8} {upcoming:>9} {refill * 1e3:>8.2f}ms {tick * 1e6:>8.1f}us "
+                      f"{scan * 1e3:>9.1f}ms {heap:>6}")
+                engine.dispose()
@@ -0,0 +1,76 @@
+import sys
+import os
+import tempfile
+import time
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+
+TASKS = int(os.environ.get('BENCH_TASKS', 1_000_000))
+ORM_SAMPLE = 5_000
+STUDENTS = 500
+
+
+def seed_core(engine, tasks):
+    from app import db, Assignment, Task, User
+
+    db.metadata.create_all(engine)
+    users = [{"id": 1, "name": "Jan", "surname": "Nowak", "email": "t", "password": "x", "role": "teacher"}]
+    users += [{"id": i, "name": "Uczen", "surname": str(i), "email": f"s{i}", "password": "x", "role": "student"}
+              for i in range(2, STUDENTS + 2)]
+    with engine.begin() as conn:
+        conn.execute(User.__table__.insert(), users)
+        conn.execute(Assignment.__table__.insert(), [
+            {"id": i + 1, "teacher_id": 1, "content": f"Zadanie {i}", "due_date": datetime(2030, 1, 1), "max_points": 10}
+            for i in range(tasks // STUDENTS + 1)])
+        for start in range(0, tasks, 100_000):
+            conn.execute(Task.__table__.insert(), [
+                {"assignment_id": i // STUDENTS + 1, "student_id": i % STUDENTS + 2, "teacher_id": 1,
+                 "completed": i % 2 == 0, "answer": "Odpowiedz ucznia", "change_seq": i + 1}
+                for i in range(start, min(start + 100_000, tasks))])
+
+
+def seed_orm(uri, tasks):
+    # The way seed scripts usually fill a database: ORM objects, one commit.
+    from app import create_app, db, Task, User
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri})
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(id=1, name="Jan", surname="Nowak", email="t", password="x", role="teacher"))
+        db.session.add_all([User(id=i, name="Uczen", surname=str(i), email=f"s{i}", password="x", role="student")
+                            for i in range(2, STUDENTS + 2)])
+        db.session.add_all([Task(content=f"Zadanie {i}", student_id=i % STUDENTS + 2, teacher_id=1,
+                                 due_date=datetime(2030, 1, 1), max_points=10) for i in range(tasks)])
+        db.session.commit()
+        db.engine.dispose()
+
+
+if __name__ == '__main__':
+    from snapshot import restore_snapshot, take_snapshot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        seed_orm(f"sqlite:///{os.path.join(tmp, 'orm.db')}", ORM_SAMPLE)
+        orm = (time.perf_counter() - start) / ORM_SAMPLE
+        print(f"ORM seed:          {orm * 1e6:8.1f} us/task, ~{orm * TASKS:6.1f} s for {TASKS} tasks")
+
+        engine = sa.create_engine(f"sqlite:///{os.path.join(tmp, 'live.db')}")
+        start = time.perf_counter()
+        seed_core(engine, TASKS)
+        print(f"bulk seed:         {time.perf_counter() - start:8.2f} s for {TASKS} tasks")
+
+        path = os.path.join(tmp, 'seed.db')
+        start = time.perf_counter()
+        size = take_snapshot(engine, path)
+        print(f"snapshot:          {time.perf_counter() - start:8.2f} s ({size / 2**20:.0f} MiB)")
+
+        with engine.begin() as conn:
+            conn.execute(sa.text("DELETE FROM task"))
+        start = time.perf_counter()
+        restore_snapshot(engine, path)
+        restore = time.perf_counter() - start
+        with engine.connect() as conn:
+            count = conn.execute(sa.text("SELECT count(*) FROM task")).scalar()
+        print(f"restore:           {restore:8.2f} s ({count} tasks)")
+        engine.dispose()
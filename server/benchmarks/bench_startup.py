@@ -0,0 +1,78 @@
+import sys
+import os
+import statistics
+import subprocess
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SERVER_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def time_subprocess(code, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=SERVER_DIR, check=True)
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def slowest_imports(limit):
+    # -X importtime lines: "import time: self [us] | cumulative | name", with
+    # name indented by nesting depth and children listed before their parent
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=SERVER_DIR, capture_output=True, text=True, check=True)
+    children = []
+    for line in result.stderr.splitlines()[1:]:
+        _, cumulative, name = line.split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth == 0 and name.strip() == 'app':
+            break
+        if depth == 0:
+            children = []
+        elif depth == 1:
+            children.append((int(cumulative), name.strip()))
+    return sorted(children, reverse=True)[:limit]
+
+
+def time_create_app(runs):
+    from app import create_app
+
+    samples = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(runs):
+            start = time.perf_counter()
+            create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, f'{i}.db')}"})
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def time_first_request():
+    from app import create_app, db
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(tmp, 'first.db')}"})
+        start = time.perf_counter()
+        with app.app_context():
+            db.create_all()
+        schema = time.perf_counter() - start
+        start = time.perf_counter()
+        app.test_client().get('/students')
+        first = time.perf_counter() - start
+        with app.app_context():
+            db.engine.dispose()
+    return schema, first
+
+
+if __name__ == '__main__':
+    print(f"python -c pass:           {time_subprocess('pass', 5) * 1e3:8.1f} ms")
+    print(f"python -c 'import flask': {time_subprocess('import flask', 5) * 1e3:8.1f} ms")
+    print(f"python -c 'import app':   {time_subprocess('import app', 5) * 1e3:8.1f} ms")
+    print(f"create_app():             {time_create_app(20) * 1e3:8.1f} ms")
+    schema, first = time_first_request()
+    print(f"db.create_all():          {schema * 1e3:8.1f} ms (create_tables.py, not on import)")
+    print(f"first request:            {first * 1e3:8.1f} ms")
+    print("slowest imports of app.py (cumulative):")
+    for cumulative, name in slowest_imports(8):
+        print(f"  {name:28} {cumulative / 1e3:8.1f} ms")
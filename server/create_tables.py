@@ -1,5 +1,8 @@
 from app import app, db
+from migrations import upgrade
 
 with app.app_context():
     db.create_all()
+    for step in upgrade():
+        print(f"Applied migration: {step}")
     print("Tables created successfully!") 
\ No newline at end of file
@@ -0,0 +1,101 @@
+import os
+import time
+
+from flask import current_app, g, has_app_context, has_request_context, request, session
+from flask_sqlalchemy.session import Session
+import sqlalchemy as sa
+
+READ_METHODS = {'GET', 'HEAD'}
+READ_STATEMENTS = (sa.Select, sa.CompoundSelect)
+# POSTed only to carry a body, they never write (see batch.py).
+READ_ENDPOINTS = {'api.batch'}
+# The writes need an upsert (dialect_insert) and one change_seq writer at a
+# time (bump_change_seq), both only done for these.
+SUPPORTED_DIALECTS = ('sqlite', 'postgresql')
+
+
+class RoutingSession(Session):
+    # A request for a school (see tenancy.py) uses that school's shard for
+    # everything. Otherwise plain SELECTs issued while handling a read request
+    # go to the read engine (replica or read-only SQLite URI), and flushes,
+    # INSERT/UPDATE/DELETE and everything outside a routed request go to the
+    # primary.
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_app_context():
+            engine = g.get('tenant_engine')
+            if engine is not None:
+                return engine
+        if (
+            bind is None
+            and not self._flushing
+            and isinstance(clause, READ_STATEMENTS)
+            and has_request_context()
+            and g.get('db_use_replica')
+        ):
+            return current_app.extensions['read_engine']
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReadWriteRouter:
+    # Marks requests that may read from the read engine and, when
+    # READ_YOUR_WRITES_SECONDS > 0, keeps a client on the primary for that long
+    # after its last successful write so it never reads a stale replica.
+    #
+    # The read engine is kept out of SQLALCHEMY_BINDS on purpose: a bind key
+    # would register a metadata for it, and create_all()/drop_all() would then
+    # expect that bind in every app sharing the `db` object.
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_READ_URI', None)
+        app.config.setdefault('READ_YOUR_WRITES_SECONDS', 5)
+        uri = app.config['SQLALCHEMY_READ_URI']
+        if not uri:
+            return
+        app.extensions['read_engine'] = make_engine(app, uri)
+        app.before_request(self._route_request)
+        app.after_request(self._pin_after_write)
+
+    def _route_request(self):
+        if not is_read_request():
+            return None
+        pinned_until = session.get('_primary_until')
+        g.db_use_replica = not pinned_until or pinned_until < time.time()
+        return None
+
+    def _pin_after_write(self, response):
+        window = current_app.config['READ_YOUR_WRITES_SECONDS']
+        if window and not is_read_request() and response.status_code < 400:
+            session['_primary_until'] = time.time() + window
+        return response
+
+
+def is_read_request():
+    return request.method in READ_METHODS or request.endpoint in READ_ENDPOINTS
+
+
+def check_dialect(uri):
+    # Called when an app or shard engine is configured, so a wrong
+    # DATABASE_URL fails at startup rather than on the first upload.
+    name = sa.engine.make_url(uri).get_backend_name()
+    if name not in SUPPORTED_DIALECTS:
+        raise ValueError(f"Unsupported database {name!r}, use one of: {', '.join(SUPPORTED_DIALECTS)}")
+
+
+def make_engine(app, uri):
+    # Relative SQLite paths (also sqlite:///file:name.db?mode=ro&uri=true)
+    # resolve against the instance folder, like SQLALCHEMY_DATABASE_URI does.
+    check_dialect(uri)
+    url = sa.engine.make_url(uri)
+    if url.drivername.startswith('sqlite') and url.database not in (None, '', ':memory:'):
+        is_uri = url.query.get('uri')
+        path = url.database[5:] if is_uri else url.database
+        if not os.path.isabs(path):
+            path = os.path.join(app.instance_path, path)
+            url = url.set(database=f"file:{path}" if is_uri else path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    return sa.create_engine(url, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
@@ -0,0 +1,108 @@
+import threading
+import time
+
+import sqlalchemy as sa
+from flask import current_app
+from sqlalchemy.orm import Session
+
+# Group commit for the submission writes that pile up right before a due
+# date. Instead of one transaction (and one fight for the SQLite write lock)
+# per request, concurrent writes to the same database are queued: the first
+# writer of a group waits GROUP_COMMIT_WINDOW seconds for others to join
+# (unless it was alone last time, too), then runs the whole group in one
+# transaction, each write in its own SAVEPOINT. A write that raises is rolled
+# back alone and only its caller sees the error; a failed COMMIT fails the
+# whole group. Groups for one database commit one at a time, writers arriving
+# meanwhile form the next group, whose leader then skips the window.
+#
+# Writes are grouped per worker process, so gunicorn needs threads
+# (gunicorn.conf.py) for groups of more than one.
+
+
+class _Write:
+    def __init__(self, write):
+        self.write = write
+        self.result = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class GroupCommit:
+    def __init__(self, app=None):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._commit_locks = {}
+        self._last_size = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('GROUP_COMMIT_ENABLED', True)
+        app.config.setdefault('GROUP_COMMIT_WINDOW', 0.002)
+        app.extensions['group_commit'] = self
+
+    def submit(self, engine, write):
+        # Runs write(session) in a group transaction on `engine` and returns
+        # its result, or raises its exception. `session` is a plain ORM
+        # session of the group; the write must not commit it.
+        entry = _Write(write)
+        # Connections of a SingletonThreadPool (SQLite :memory:) belong to
+        # one thread, another thread's write would land in another database.
+        if not current_app.config['GROUP_COMMIT_ENABLED'] or isinstance(engine.pool, sa.pool.SingletonThreadPool):
+            self._commit(engine, [entry])
+            return self._outcome(entry)
+
+        with self._lock:
+            pending = self._pending.setdefault(engine, [])
+            pending.append(entry)
+            leader = len(pending) == 1
+            commit_lock = self._commit_locks.setdefault(engine, threading.Lock())
+        if leader:
+            # The window is waited out before taking commit_lock, never while
+            # holding it. It is skipped by a lone writer (the last group had
+            # no company either), and when a group is committing: waiting for
+            # commit_lock gathers the next group anyway.
+            window = current_app.config['GROUP_COMMIT_WINDOW']
+            if window and self._last_size.get(engine, 0) > 1 and not commit_lock.locked():
+                time.sleep(window)
+            with commit_lock:
+                # Taken only now: writers that came while the previous group
+                # was committing are part of this one.
+                with self._lock:
+                    group = self._pending.pop(engine)
+                    self._last_size[engine] = len(group)
+                self._commit(engine, group)
+        entry.done.wait()
+        return self._outcome(entry)
+
+    def _outcome(self, entry):
+        if entry.error is not None:
+            raise entry.error
+        return entry.result
+
+    def _commit(self, engine, group):
+        try:
+            with engine.connect() as conn:
+                conn.begin()
+                # pysqlite only sends BEGIN before DML, the first SAVEPOINT
+                # would open (and its RELEASE commit) the transaction instead.
+                # IMMEDIATE takes the write lock up front, a deferred
+                # transaction could fail to upgrade its lock halfway through.
+                if conn.dialect.name == 'sqlite':
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                with Session(bind=conn) as session:
+                    for entry in group:
+                        try:
+                            with session.begin_nested():
+                                entry.result = entry.write(session)
+                        except Exception as exc:
+                            entry.error = exc
+                    session.flush()
+                conn.commit()
+        except Exception as exc:
+            for entry in group:
+                if entry.error is None:
+                    entry.result, entry.error = None, exc
+        finally:
+            for entry in group:
+                entry.done.set()
@@ -0,0 +1,36 @@
+import gc
+import multiprocessing
+import os
+
+wsgi_app = 'wsgi:app'
+bind = os.environ.get('BIND', '0.0.0.0:5000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+# Submissions handled by threads of one worker share their commits
+# (group_commit.py); with a single thread every request commits alone.
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Import and build the app once in the master, workers inherit it through fork
+# and share those memory pages copy-on-write.
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Move everything allocated so far into the permanent generation, so the
+    # cyclic GC in the workers never writes to (and thereby copies) the shared
+    # pages.
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Connections opened in the master must not be used from several
+    # processes; drop them without closing the parent's sockets/files.
+    from app import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    if 'read_engine' in app.extensions:
+        app.extensions['read_engine'].dispose(close=False)
+    if 'tenancy' in app.extensions:
+        app.extensions['tenancy'].dispose(close=False)
@@ -0,0 +1,281 @@
+import hashlib
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, has_app_context, jsonify, request
+
+# A client sends the same Idempotency-Key header when it retries a request.
+# The first request runs the handler and its response is stored; retries get
+# the stored response back without running the handler again, and a retry
+# arriving while the first request is still running waits for its result.
+DEFAULT_ENDPOINTS = {'api.create_task', 'api.mark_task_completed', 'api.upload_file'}
+MAX_KEY_LENGTH = 255
+
+# begin() outcomes
+CLAIMED = 'claimed'
+REPLAY = 'replay'
+MISMATCH = 'mismatch'
+BUSY = 'busy'
+
+
+class _Entry:
+    __slots__ = ('fingerprint', 'expires', 'record', 'event')
+
+    def __init__(self, fingerprint, expires):
+        self.fingerprint = fingerprint
+        self.expires = expires
+        self.record = None
+        self.event = threading.Event()
+
+
+class MemoryResponseStore:
+    # Stored responses for a single process, striped like MemoryBucketStore.
+    # An entry without a record is in flight; waiters block on its event.
+
+    def __init__(self, ttl=86400, stripes=64, max_keys=10000, clock=time.monotonic):
+        if stripes & (stripes - 1):
+            raise ValueError("stripes must be a power of two")
+        self._mask = stripes - 1
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._entries = [{} for _ in range(stripes)]
+        self._max_per_stripe = max(1, max_keys // stripes)
+        self._ttl = ttl
+        self._clock = clock
+
+    def begin(self, key, fingerprint, wait):
+        i = hash(key) & self._mask
+        entries = self._entries[i]
+        deadline = time.monotonic() + wait
+        while True:
+            now = self._clock()
+            with self._locks[i]:
+                entry = entries.get(key)
+                if entry is None or entry.expires <= now:
+                    if len(entries) >= self._max_per_stripe:
+                        self._prune(entries, now)
+                    entries[key] = _Entry(fingerprint, now + self._ttl)
+                    return CLAIMED, None
+                if entry.fingerprint != fingerprint:
+                    return MISMATCH, None
+                if entry.record is not None:
+                    return REPLAY, entry.record
+                event = entry.event
+            # Woken by finish() (replay on the next pass) or abandon() (the
+            # key is free again and this request claims it).
+            if not event.wait(max(0.0, deadline - time.monotonic())):
+                return BUSY, None
+
+    def finish(self, key, record):
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            entry = self._entries[i].get(key)
+            if entry is None:
+                return
+            entry.record = record
+            entry.expires = self._clock() + self._ttl
+        entry.event.set()
+
+    def abandon(self, key):
+        i = hash(key) & self._mask
+        with self._locks[i]:
+            entry = self._entries[i].pop(key, None)
+        if entry is not None:
+            entry.event.set()
+
+    def clear(self):
+        for lock, entries in zip(self._locks, self._entries):
+            with lock:
+                entries.clear()
+
+    def _prune(self, entries, now):
+        # Expired entries go first, then the oldest finished one. In-flight
+        # entries are never dropped, their waiters depend on them.
+        expired = [key for key, entry in entries.items() if entry.expires <= now and entry.record is not None]
+        for key in expired:
+            del entries[key]
+        if not expired:
+            oldest = next((key for key, entry in entries.items() if entry.record is not None), None)
+            if oldest is not None:
+                del entries[oldest]
+
+
+class SqliteResponseStore:
+    # Stored responses shared by every worker process on one host. Waiters
+    # poll the row of the in-flight request. An in-flight row expires after
+    # `lease` seconds, so a worker that died mid-request does not block its
+    # key for the whole ttl.
+
+    def __init__(self, path, ttl=86400, lease=60, poll_interval=0.05, clock=time.time):
+        self._path = path
+        self._ttl = ttl
+        self._lease = lease
+        self._poll_interval = poll_interval
+        self._clock = clock
+        self._local = threading.local()
+        # Not kept in self._local, see SqliteBucketStore.
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS response ("
+            "key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, expires REAL NOT NULL, "
+            "status INTEGER, content_type TEXT, body BLOB)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_response_expires ON response (expires)")
+        conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def begin(self, key, fingerprint, wait):
+        conn = self._connect()
+        deadline = time.monotonic() + wait
+        while True:
+            now = self._clock()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT fingerprint, expires, status, content_type, body FROM response WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None or row[1] <= now:
+                    conn.execute("DELETE FROM response WHERE expires <= ?", (now,))
+                    conn.execute(
+                        "INSERT OR REPLACE INTO response (key, fingerprint, expires) VALUES (?, ?, ?)",
+                        (key, fingerprint, now + self._lease),
+                    )
+                    conn.execute("COMMIT")
+                    return CLAIMED, None
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            if row[0] != fingerprint:
+                return MISMATCH, None
+            if row[2] is not None:
+                return REPLAY, (row[2], row[3], row[4])
+            if time.monotonic() >= deadline:
+                return BUSY, None
+            time.sleep(self._poll_interval)
+
+    def finish(self, key, record):
+        status, content_type, body = record
+        self._connect().execute(
+            "UPDATE response SET status = ?, content_type = ?, body = ?, expires = ? WHERE key = ?",
+            (status, content_type, body, self._clock() + self._ttl, key),
+        )
+
+    def abandon(self, key):
+        self._connect().execute("DELETE FROM response WHERE key = ? AND status IS NULL", (key,))
+
+    def clear(self):
+        self._connect().execute("DELETE FROM response")
+
+
+class IdempotencyState:
+    # Per app, in app.extensions['idempotency'].
+
+    def __init__(self, store, endpoints):
+        self.store = store
+        self.endpoints = endpoints
+
+
+class Idempotency:
+    def __init__(self, app=None, store=None):
+        # A store given here is used by every app, otherwise each app gets
+        # the one its config asks for.
+        self.store = store
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('IDEMPOTENCY_ENABLED', True)
+        app.config.setdefault('IDEMPOTENCY_ENDPOINTS', DEFAULT_ENDPOINTS)
+        app.config.setdefault('IDEMPOTENCY_HEADER', 'Idempotency-Key')
+        app.config.setdefault('IDEMPOTENCY_TTL', 86400)
+        app.config.setdefault('IDEMPOTENCY_WAIT_SECONDS', 30)
+        app.config.setdefault('IDEMPOTENCY_STORAGE_PATH', None)
+
+        store = self.store
+        if store is None:
+            path = app.config['IDEMPOTENCY_STORAGE_PATH']
+            ttl = app.config['IDEMPOTENCY_TTL']
+            store = SqliteResponseStore(path, ttl=ttl) if path else MemoryResponseStore(ttl=ttl)
+
+        app.extensions['idempotency'] = IdempotencyState(store, set(app.config['IDEMPOTENCY_ENDPOINTS']))
+        app.before_request(self._begin)
+        app.after_request(self._finish)
+        app.teardown_request(self._abandon)
+
+    def _begin(self):
+        req = request._get_current_object()
+        state = current_app.extensions['idempotency']
+        if req.endpoint not in state.endpoints or not current_app.config['IDEMPOTENCY_ENABLED']:
+            return None
+        key = req.headers.get(current_app.config['IDEMPOTENCY_HEADER'])
+        if key is None:
+            return None
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"message": "Invalid Idempotency-Key"}), 400
+
+        # Keys are chosen by clients, so they are scoped to the school and
+        # endpoint; the fingerprint catches a key reused for another payload.
+        key = f"{g.get('tenant', '')}|{req.endpoint}|{key}"
+        outcome, record = state.store.begin(key, fingerprint(req), current_app.config['IDEMPOTENCY_WAIT_SECONDS'])
+        if outcome == CLAIMED:
+            g.idempotency_key = key
+            return None
+        if outcome == REPLAY:
+            status, content_type, body = record
+            response = current_app.response_class(body, status=status, content_type=content_type)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        if outcome == MISMATCH:
+            return jsonify({"message": "Idempotency-Key was already used for a different request"}), 422
+        response = jsonify({"message": "A request with this Idempotency-Key is still in progress"})
+        response.status_code = 409
+        response.headers['Retry-After'] = '1'
+        return response
+
+    def _finish(self, response):
+        key = g.pop('idempotency_key', None)
+        if key is None:
+            return response
+        # 5xx and streamed responses are not kept, a retry runs the handler.
+        store = current_app.extensions['idempotency'].store
+        if response.status_code >= 500 or response.is_streamed or response.direct_passthrough:
+            store.abandon(key)
+        else:
+            store.finish(key, (response.status_code, response.content_type, response.get_data()))
+        return response
+
+    def _abandon(self, exc):
+        # The handler raised and no response went through _finish. Test
+        # clients that preserve the request context pop it without an app
+        # context, after _finish already ran.
+        if not has_app_context():
+            return
+        key = g.pop('idempotency_key', None)
+        if key is not None:
+            current_app.extensions['idempotency'].store.abandon(key)
+
+
+def fingerprint(req):
+    # Multipart bodies are hashed field by field: the boundary differs
+    # between two sends of the same form.
+    digest = hashlib.sha256(f"{req.method} {req.path}\n".encode())
+    if req.mimetype == 'multipart/form-data':
+        for name, value in sorted(req.form.items(multi=True)):
+            digest.update(f"{name}={value}\n".encode())
+        for name, file in sorted(req.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"{name}:{file.filename}\n".encode())
+            for chunk in iter(lambda: file.stream.read(65536), b''):
+                digest.update(chunk)
+            file.stream.seek(0)
+    else:
+        digest.update(req.get_data(cache=True))
+    return digest.hexdigest()
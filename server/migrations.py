@@ -0,0 +1,107 @@
+import os
+
+import sqlalchemy as sa
+
+from app import db
+
+# db.create_all() only creates missing tables. The steps below bring tables
+# created by an older version up to date; each one checks the live schema
+# first, so upgrade() can run on every deploy.
+
+
+def _columns(engine, table):
+    return {column['name'] for column in sa.inspect(engine).get_columns(table)}
+
+
+def add_task_change_seq(engine):
+    if 'change_seq' in _columns(engine, 'task'):
+        return False
+    with engine.begin() as conn:
+        conn.execute(sa.text("ALTER TABLE task ADD COLUMN change_seq INTEGER"))
+        # Existing rows get distinct sequence numbers so a first sync with
+        # since=0 can page through them.
+        conn.execute(sa.text("UPDATE task SET change_seq = id"))
+    return True
+
+
+def move_task_definitions_to_assignments(engine):
+    # Tasks used to carry their own content/due_date/max_points. Identical
+    # definitions from the same teacher become one Assignment, then the
+    # copied columns are dropped (ALTER TABLE DROP COLUMN, SQLite >= 3.35).
+    if 'content' not in _columns(engine, 'task'):
+        return False
+    key = ("a.teacher_id = task.teacher_id AND a.content = task.content "
+           "AND a.due_date IS task.due_date AND a.max_points IS task.max_points")
+    with engine.begin() as conn:
+        conn.execute(sa.text("ALTER TABLE task ADD COLUMN assignment_id INTEGER REFERENCES assignment (id)"))
+        conn.execute(sa.text(
+            "INSERT INTO assignment (teacher_id, content, due_date, max_points, change_seq) "
+            "SELECT teacher_id, content, due_date, max_points, 0 FROM task "
+            "GROUP BY teacher_id, content, due_date, max_points ORDER BY min(id)"
+        ))
+        conn.execute(sa.text(
+            "CREATE INDEX tmp_assignment_definition ON assignment (teacher_id, content, due_date, max_points)"
+        ))
+        conn.execute(sa.text(f"UPDATE task SET assignment_id = (SELECT a.id FROM assignment a WHERE {key})"))
+        conn.execute(sa.text("DROP INDEX tmp_assignment_definition"))
+        for column in ('content', 'due_date', 'max_points'):
+            conn.execute(sa.text(f"ALTER TABLE task DROP COLUMN {column}"))
+    return True
+
+
+def add_file_size(engine):
+    # Sizes of files uploaded before file_size existed are read from disk
+    # once (paths are relative to the server directory, as stored), then
+    # storage_usage is rebuilt from them.
+    from storage import rebuild_storage_usage
+
+    tables = [table for table in ('task', 'archived_task')
+              if sa.inspect(engine).has_table(table) and 'file_size' not in _columns(engine, table)]
+    if not tables:
+        return False
+    with engine.begin() as conn:
+        for table in tables:
+            conn.execute(sa.text(f"ALTER TABLE {table} ADD COLUMN file_size INTEGER"))
+            rows = conn.execute(sa.text(f"SELECT id, file_path FROM {table} WHERE file_path IS NOT NULL")).all()
+            sizes = [{"id": row.id, "size": os.path.getsize(row.file_path)}
+                     for row in rows if os.path.isfile(row.file_path)]
+            if sizes:
+                conn.execute(sa.text(f"UPDATE {table} SET file_size = :size WHERE id = :id"), sizes)
+    rebuild_storage_usage(engine)
+    return True
+
+
+def create_missing_indexes(engine):
+    inspector = sa.inspect(engine)
+    created = False
+    for table in db.metadata.sorted_tables:
+        existing = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(engine)
+                created = True
+    return created
+
+
+STEPS = [
+    add_task_change_seq,
+    move_task_definitions_to_assignments,
+    add_file_size,
+    create_missing_indexes,
+]
+
+
+def upgrade(engine=None):
+    # Defaults to the current app's database; pass an engine for a tenant
+    # shard (see tenancy.py).
+    engine = engine if engine is not None else db.engine
+    applied = []
+    for step in STEPS:
+        if step(engine):
+            applied.append(step.__name__)
+    return applied
+
+
+def create_schema(engine):
+    db.metadata.create_all(engine)
+    return upgrade(engine)
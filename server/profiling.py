@@ -0,0 +1,247 @@
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request
+import sqlalchemy as sa
+
+# Profiles single requests on demand: an admin sends `X-Profile: <admin_id>`
+# (or `?profile=<admin_id>`), or PROFILE_SAMPLE_RATE picks a fraction of all
+# requests. A profiled request's thread is stack-sampled every
+# PROFILE_INTERVAL seconds and its SQL statements are timed. While nothing is
+# profiled there is no sampler thread and no SQL listener, the only cost is
+# the header check.
+
+
+class ProfileStore:
+    # One JSON file per profile, shared by all workers on a host; only the
+    # newest `max_profiles` are kept.
+
+    def __init__(self, folder, max_profiles=100):
+        self.folder = folder
+        self.max_profiles = max_profiles
+
+    def save(self, profile):
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, f"{profile['id']}.json")
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(profile, f)
+        os.replace(tmp, path)
+        for old in self._files()[:-self.max_profiles]:
+            try:
+                os.remove(old)
+            except FileNotFoundError:
+                pass
+
+    def get(self, profile_id):
+        if not profile_id.isalnum():
+            return None
+        try:
+            with open(os.path.join(self.folder, f"{profile_id}.json"), encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def list(self):
+        profiles = []
+        for path in reversed(self._files()):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    profiles.append(json.load(f))
+            except FileNotFoundError:
+                pass
+        return profiles
+
+    def _files(self):
+        # Oldest first.
+        if not os.path.isdir(self.folder):
+            return []
+        with os.scandir(self.folder) as entries:
+            files = [(entry.stat().st_mtime_ns, entry.path) for entry in entries if entry.name.endswith('.json')]
+        return [path for _, path in sorted(files)]
+
+
+class ProfilerState:
+    # Per app, in app.extensions['profiler']. The sampler thread and SQL
+    # listeners are process-wide and stay on the Profiler. Profiles of a
+    # school's requests (see tenancy.py) go to its own subfolder, like
+    # snapshots; they hold paths, query strings and SQL.
+
+    def __init__(self, store, interval, authorize):
+        self.store = store
+        self.interval = interval
+        self.authorize = authorize
+
+    def store_for(self, school):
+        if not school:
+            return self.store
+        return ProfileStore(os.path.join(self.store.folder, school), self.store.max_profiles)
+
+
+class _ActiveProfile:
+    def __init__(self, trigger, interval):
+        self.id = uuid.uuid4().hex
+        self.trigger = trigger
+        self.interval = interval
+        self.thread = threading.get_ident()
+        self.started = datetime.now()
+        self.start = time.perf_counter()
+        self.stacks = {}
+        self.samples = 0
+        self.sql = []
+
+    def sample(self, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{frame.f_globals.get('__name__', '?')}.{code.co_name}:{code.co_firstlineno}")
+            frame = frame.f_back
+        stack = ";".join(reversed(names))
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+
+
+class Profiler:
+    def __init__(self, app=None):
+        self._active = {}
+        self._lock = threading.Lock()
+        self._sampler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, authorize=None):
+        # authorize(admin_id) tells whether an X-Profile header may start a
+        # profile; without it only PROFILE_SAMPLE_RATE profiles requests.
+        app.config.setdefault('PROFILE_HEADER', 'X-Profile')
+        app.config.setdefault('PROFILE_SAMPLE_RATE', 0.0)
+        app.config.setdefault('PROFILE_INTERVAL', 0.005)
+        app.config.setdefault('PROFILE_FOLDER', 'profiles')
+        app.config.setdefault('PROFILE_MAX_PROFILES', 100)
+
+        folder = app.config['PROFILE_FOLDER']
+        if not os.path.isabs(folder):
+            folder = os.path.join(app.instance_path, folder)
+        store = ProfileStore(folder, app.config['PROFILE_MAX_PROFILES'])
+        app.extensions['profiler'] = ProfilerState(store, app.config['PROFILE_INTERVAL'], authorize)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+
+    def _start(self):
+        req = request._get_current_object()
+        state = current_app.extensions['profiler']
+        admin_id = req.headers.get(current_app.config['PROFILE_HEADER']) or req.args.get('profile')
+        if admin_id:
+            if state.authorize is None or not state.authorize(admin_id):
+                return None
+            trigger = 'admin'
+        else:
+            rate = current_app.config['PROFILE_SAMPLE_RATE']
+            if not rate or random.random() >= rate:
+                return None
+            trigger = 'sample'
+
+        # Kept on the request: /batch runs its sub-requests on this thread
+        # and in this app context, each with its own profile (if any).
+        profile = _ActiveProfile(trigger, state.interval)
+        req.environ['profiler.profile'] = profile
+        with self._lock:
+            if not self._active:
+                sa.event.listen(sa.engine.Engine, 'before_cursor_execute', self._before_execute)
+                sa.event.listen(sa.engine.Engine, 'after_cursor_execute', self._after_execute)
+            self._active[profile.id] = profile
+            if self._sampler is None:
+                self._sampler = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._sampler.start()
+        return None
+
+    def _stop(self):
+        profile = request.environ.pop('profiler.profile', None)
+        if profile is None:
+            return None
+        with self._lock:
+            del self._active[profile.id]
+            if not self._active:
+                sa.event.remove(sa.engine.Engine, 'before_cursor_execute', self._before_execute)
+                sa.event.remove(sa.engine.Engine, 'after_cursor_execute', self._after_execute)
+        return profile
+
+    def _finish(self, response):
+        profile = self._stop()
+        if profile is None:
+            return response
+        current_app.extensions['profiler'].store_for(g.get('tenant')).save(self._result(profile, response.status_code))
+        response.headers['X-Profile-Id'] = profile.id
+        return response
+
+    def _discard(self, exc):
+        # The request raised before _finish; the profile is still useful.
+        # Test clients that preserve the request context pop it without an
+        # app context, after _finish already ran.
+        profile = self._stop()
+        if profile is not None and has_app_context():
+            current_app.extensions['profiler'].store_for(g.get('tenant')).save(self._result(profile, 500))
+
+    def _result(self, profile, status):
+        req = request._get_current_object()
+        sql_ms = sum(ms for _, ms in profile.sql)
+        return {
+            "id": profile.id,
+            "trigger": profile.trigger,
+            "method": req.method,
+            "path": req.full_path.rstrip('?'),
+            "endpoint": req.endpoint,
+            "status": status,
+            "started": profile.started.strftime("%Y-%m-%d %H:%M:%S"),
+            "duration_ms": round((time.perf_counter() - profile.start) * 1e3, 3),
+            "interval_ms": profile.interval * 1e3,
+            "samples": profile.samples,
+            "stacks": profile.stacks,
+            "sql": [{"statement": statement, "ms": round(ms, 3)} for statement, ms in profile.sql],
+            "sql_ms": round(sql_ms, 3),
+        }
+
+    def _sample(self):
+        while True:
+            with self._lock:
+                if not self._active:
+                    self._sampler = None
+                    return
+                active = list(self._active.values())
+            frames = sys._current_frames()
+            for profile in active:
+                frame = frames.get(profile.thread)
+                if frame is not None:
+                    profile.sample(frame)
+            del frames
+            time.sleep(min(profile.interval for profile in active))
+
+    def _profiles_on_thread(self):
+        # A nested profile (a sampled /batch sub-request) shares the thread
+        # with the outer one; both get its statements.
+        ident = threading.get_ident()
+        return [profile for profile in list(self._active.values()) if profile.thread == ident]
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self._profiles_on_thread():
+            conn.info.setdefault('profile_start', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        profiles = self._profiles_on_thread()
+        starts = conn.info.get('profile_start')
+        if profiles and starts:
+            ms = (time.perf_counter() - starts.pop()) * 1e3
+            for profile in profiles:
+                profile.sql.append((statement, ms))
+
+
+def collapsed_stacks(profile):
+    # Brendan Gregg's folded format, for flamegraph.pl, speedscope or
+    # inferno: one "frame;frame;frame count" line per distinct stack.
+    return "".join(f"{stack} {count}\n" for stack, count in sorted(profile["stacks"].items()))
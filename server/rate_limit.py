@@ -0,0 +1,173 @@
+import math
+import sqlite3
+import threading
+import time
+
+from flask import current_app, g, jsonify, request, session
+
+# endpoint -> (requests, period in seconds); the bucket holds `requests` tokens
+# and refills at requests / period tokens per second
+DEFAULT_LIMITS = {
+    'api.login': (10, 60),
+    'api.get_tasks': (120, 60),
+    'api.create_task': (60, 60),
+    'api.upload_file': (30, 60),
+}
+
+
+class MemoryBucketStore:
+    # Token buckets for a single process. Keys are spread over a fixed number
+    # of stripes, each with its own lock and dict, so concurrent requests only
+    # contend when their keys hash to the same stripe.
+
+    def __init__(self, stripes=64, max_keys=100000, idle_ttl=3600, clock=time.monotonic):
+        if stripes & (stripes - 1):
+            raise ValueError("stripes must be a power of two")
+        self._mask = stripes - 1
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._buckets = [{} for _ in range(stripes)]
+        self._max_per_stripe = max(1, max_keys // stripes)
+        self._idle_ttl = idle_ttl
+        self._clock = clock
+
+    def take(self, key, rate, burst):
+        # Returns 0 when a token was taken, otherwise the number of seconds
+        # until the next token becomes available.
+        now = self._clock()
+        i = hash(key) & self._mask
+        buckets = self._buckets[i]
+        with self._locks[i]:
+            bucket = buckets.get(key)
+            if bucket is None:
+                if len(buckets) >= self._max_per_stripe:
+                    self._prune(buckets, now)
+                buckets[key] = [burst - 1.0, now]
+                return 0.0
+            tokens = bucket[0] + (now - bucket[1]) * rate
+            if tokens > burst:
+                tokens = burst
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                return 0.0
+            bucket[0] = tokens
+            return (1.0 - tokens) / rate
+
+    def clear(self):
+        for lock, buckets in zip(self._locks, self._buckets):
+            with lock:
+                buckets.clear()
+
+    def _prune(self, buckets, now):
+        # Buckets idle for longer than any limit period have refilled
+        # completely and carry no state worth keeping. If none qualify, the
+        # oldest inserted key goes.
+        stale = [key for key, (_, last) in buckets.items() if now - last >= self._idle_ttl]
+        for key in stale:
+            del buckets[key]
+        if not stale:
+            del buckets[next(iter(buckets))]
+
+
+class SqliteBucketStore:
+    # Token buckets shared by every worker process on one host. Each take() is
+    # a single short IMMEDIATE transaction on a small WAL-mode database.
+
+    def __init__(self, path, clock=time.time):
+        self._path = path
+        self._clock = clock
+        self._local = threading.local()
+        # Not kept in self._local: the store may be built in a preloading
+        # master process and a SQLite connection must not cross a fork.
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS bucket ("
+            "key TEXT PRIMARY KEY, tokens REAL NOT NULL, ts REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        conn.close()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, burst):
+        now = self._clock()
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, ts FROM bucket WHERE key = ?", (key,)).fetchone()
+            tokens = burst if row is None else min(burst, row[0] + (now - row[1]) * rate)
+            wait = 0.0 if tokens >= 1.0 else (1.0 - tokens) / rate
+            if wait == 0.0:
+                tokens -= 1.0
+            conn.execute("INSERT OR REPLACE INTO bucket (key, tokens, ts) VALUES (?, ?, ?)", (key, tokens, now))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return wait
+
+    def clear(self):
+        self._connect().execute("DELETE FROM bucket")
+
+
+class RateLimitState:
+    # Per app, in app.extensions['rate_limiter']: the module-level limiter is
+    # shared by every create_app().
+
+    def __init__(self, store, limits):
+        self.store = store
+        self.limits = limits
+
+
+class RateLimiter:
+    def __init__(self, app=None, store=None):
+        # A store given here is used by every app, otherwise each app gets
+        # the one its config asks for.
+        self.store = store
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATELIMIT_ENABLED', True)
+        app.config.setdefault('RATELIMIT_LIMITS', DEFAULT_LIMITS)
+        app.config.setdefault('RATELIMIT_STORAGE_PATH', None)
+
+        store = self.store
+        if store is None:
+            path = app.config['RATELIMIT_STORAGE_PATH']
+            store = SqliteBucketStore(path) if path else MemoryBucketStore()
+        limits = {endpoint: (count / period, float(count))
+                  for endpoint, (count, period) in app.config['RATELIMIT_LIMITS'].items()}
+
+        app.extensions['rate_limiter'] = RateLimitState(store, limits)
+        app.before_request(self._check)
+
+    def _check(self):
+        # Runs on every request, so each context-local proxy is resolved once.
+        req = request._get_current_object()
+        app = current_app._get_current_object()
+        state = app.extensions['rate_limiter']
+        limit = state.limits.get(req.endpoint)
+        if limit is None or not app.config['RATELIMIT_ENABLED']:
+            return None
+
+        # Flask-Login keeps the user id in the session, reading it directly
+        # avoids loading the User row on every request.
+        user_id = session._get_current_object().get('_user_id')
+        identity = f"u:{user_id}" if user_id else f"ip:{req.remote_addr}"
+        # User ids repeat across schools; g.tenant is set by tenancy, whose
+        # before_request runs first.
+        wait = state.store.take(f"{g.get('tenant', '')}|{req.endpoint}|{identity}", *limit)
+        if wait:
+            response = jsonify({"message": "Too many requests"})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(math.ceil(wait))
+            return response
+        return None
@@ -0,0 +1,237 @@
+import argparse
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+
+from app import app, db, dialect_insert, Assignment, Log, Reminder, Task
+
+# Reminds students of tasks that are about to be due. The scheduler keeps a
+# heap of upcoming reminder times, loaded by a query on the indexed
+# assignment.due_date window, so its cost follows the number of upcoming
+# deadlines and not the size of the task table. Runs as a sidecar:
+#
+#   python reminders.py
+#   TENANT_SHARD_MAP=shards.json python reminders.py --interval 30
+#
+# or in-process with ReminderScheduler(engine).start().
+
+DEFAULT_LEADS = (24 * 3600, 3600)
+
+logger = logging.getLogger(__name__)
+
+task = Task.__table__
+assignment = Assignment.__table__
+reminder = Reminder.__table__
+
+
+class LogSink:
+    # Default sink: one Log entry per reminder, on the student's account.
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def __call__(self, events):
+        with self.engine.begin() as conn:
+            conn.execute(Log.__table__.insert(), [{
+                "user_id": event["student_id"],
+                "action": f"Reminder: \"{event['content']}\" is due {event['due_date']:%Y-%m-%d %H:%M}",
+            } for event in events])
+
+
+class ReminderScheduler:
+    def __init__(self, engine, sink=None, leads=DEFAULT_LEADS, refresh=60, batch_size=500,
+                 school=None, clock=datetime.now):
+        self.engine = engine
+        self.sink = sink if sink is not None else LogSink(engine)
+        self.leads = sorted(leads)
+        self.refresh = refresh
+        self.batch_size = batch_size
+        self.school = school
+        self.clock = clock
+        self._heap = []
+        self._next_refill = None
+        self._stop = threading.Event()
+
+    def refill(self, now):
+        # Rebuilt from scratch every `refresh` seconds, which also picks up
+        # new tasks and changed due dates. Only deadlines that can need a
+        # reminder before the next refill are loaded.
+        horizon = now + timedelta(seconds=self.leads[-1] + self.refresh)
+        window = sa.and_(assignment.c.due_date > now, assignment.c.due_date <= horizon)
+        with self.engine.connect() as conn:
+            rows = conn.execute(
+                sa.select(task.c.id, assignment.c.due_date)
+                .select_from(task.join(assignment))
+                .where(window, task.c.completed.is_not(True))
+            ).all()
+            sent = set(conn.execute(
+                sa.select(reminder.c.task_id, reminder.c.lead)
+                .select_from(reminder.join(task, task.c.id == reminder.c.task_id).join(assignment))
+                .where(window)
+            ).all())
+
+        heap = []
+        for task_id, due_date in rows:
+            for lead in self.leads:
+                fire_at = due_date - timedelta(seconds=lead)
+                if (task_id, lead) not in sent:
+                    heap.append((fire_at, task_id, lead))
+                if fire_at <= now:
+                    # Longer leads are overdue as well; the shortest overdue
+                    # one is the only reminder that still makes sense.
+                    break
+        heapq.heapify(heap)
+        self._heap = heap
+        self._next_refill = now + timedelta(seconds=self.refresh)
+        return len(heap)
+
+    def tick(self, now=None):
+        now = now or self.clock()
+        if self._next_refill is None or now >= self._next_refill:
+            self.refill(now)
+        sent = 0
+        while self._heap and self._heap[0][0] <= now:
+            batch = []
+            while self._heap and self._heap[0][0] <= now and len(batch) < self.batch_size:
+                batch.append(heapq.heappop(self._heap))
+            sent += self._send(batch, now)
+        return sent
+
+    def next_wake(self, now):
+        # Seconds until the next reminder or refill is due.
+        wake = self._next_refill or now
+        if self._heap and self._heap[0][0] < wake:
+            wake = self._heap[0][0]
+        return max(0.0, (wake - now).total_seconds())
+
+    def _send(self, batch, now):
+        leads = {}
+        for _, task_id, lead in batch:
+            if lead < leads.get(task_id, lead + 1):
+                leads[task_id] = lead
+
+        with self.engine.begin() as conn:
+            # Re-read the batch: tasks may have been completed or moved since
+            # the heap was loaded.
+            rows = conn.execute(
+                sa.select(task.c.id, task.c.student_id, task.c.teacher_id, assignment.c.content, assignment.c.due_date)
+                .select_from(task.join(assignment))
+                .where(task.c.id.in_(leads), task.c.completed.is_not(True), assignment.c.due_date > now)
+            ).all()
+            due = []
+            for row in rows:
+                fire_at = row.due_date - timedelta(seconds=leads[row.id])
+                if fire_at > now:
+                    heapq.heappush(self._heap, (fire_at, row.id, leads[row.id]))
+                else:
+                    due.append(row)
+            if not due:
+                return 0
+            # Claimed before the sink runs: a reminder goes out at most once,
+            # even with several schedulers on the same database. The sink
+            # runs after this transaction, LogSink writes to the same
+            # database and would wait for its lock.
+            claimed = set(conn.execute(
+                insert_ignore(conn, reminder)
+                .values([{"task_id": row.id, "lead": leads[row.id], "sent_at": now} for row in due])
+                .returning(reminder.c.task_id)
+            ).scalars())
+
+        events = [{
+            "school": self.school,
+            "task_id": row.id,
+            "student_id": row.student_id,
+            "teacher_id": row.teacher_id,
+            "content": row.content,
+            "due_date": row.due_date,
+            "lead": leads[row.id],
+        } for row in due if row.id in claimed]
+        if events:
+            try:
+                self.sink(events)
+            except Exception:
+                # Nothing is known to have gone out (e.g. the mail gateway is
+                # down): release the claims, the next refill schedules these
+                # reminders again.
+                with self.engine.begin() as conn:
+                    conn.execute(reminder.delete().where(
+                        sa.tuple_(reminder.c.task_id, reminder.c.lead)
+                        .in_([(event["task_id"], event["lead"]) for event in events])))
+                raise
+        return len(events)
+
+    def run(self, interval=30):
+        while not self._stop.is_set():
+            now = self.clock()
+            try:
+                self.tick(now)
+            except Exception:
+                logger.exception("Reminder tick failed")
+            self._stop.wait(min(interval, self.next_wake(now)))
+
+    def start(self, interval=30):
+        thread = threading.Thread(target=self.run, args=(interval,), name="reminders", daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+
+def insert_ignore(conn, table):
+    return dialect_insert(conn)(table).on_conflict_do_nothing()
+
+
+def schedulers(app, cache, **options):
+    # One scheduler per school (the shard map is re-read, so new and moved
+    # schools are picked up), or one for the app's database.
+    if 'tenancy' not in app.extensions:
+        if None not in cache:
+            cache[None] = ReminderScheduler(db.engine, **options)
+        return [cache[None]]
+    state = app.extensions['tenancy']
+    state.shards.reload()
+    active = []
+    for school, shard in sorted(state.shards.schools.items()):
+        key = (school, shard['uri'])
+        if key not in cache:
+            cache[key] = ReminderScheduler(state.engine_for(shard['uri']), school=school, **options)
+        active.append(cache[key])
+    return active
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Send reminders for tasks that are about to be due")
+    parser.add_argument('--interval', type=float, default=30, help="longest sleep between checks, in seconds")
+    parser.add_argument('--leads', default=",".join(str(lead) for lead in DEFAULT_LEADS),
+                        help="comma-separated seconds before due_date")
+    parser.add_argument('--once', action='store_true', help="check once and exit")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    leads = [int(lead) for lead in args.leads.split(',')]
+
+    cache = {}
+    with app.app_context():
+        while True:
+            now = datetime.now()
+            wake = args.interval
+            for scheduler in schedulers(app, cache, leads=leads):
+                try:
+                    sent = scheduler.tick(now)
+                except Exception:
+                    logger.exception("Reminder tick failed for %s", scheduler.school or "default database")
+                    continue
+                if sent:
+                    logger.info("Sent %d reminders (%s)", sent, scheduler.school or "default database")
+                wake = min(wake, scheduler.next_wake(now))
+            if args.once:
+                break
+            time.sleep(wake)
+
+
+if __name__ == '__main__':
+    main()
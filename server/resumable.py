@@ -0,0 +1,86 @@
+import hashlib
+import os
+from datetime import datetime, timedelta
+
+import sqlalchemy as sa
+from werkzeug.exceptions import ClientDisconnected
+
+from tenancy import upload_folder
+
+# Resumable uploads: the client creates a session for a file of known size,
+# PUTs chunks at the offset the server reports, and completes the session.
+# Chunks are streamed into uploads/.partial/<id> and the finished file is
+# moved next to single-shot uploads with os.replace, so a task never points
+# to a half-written file.
+
+PARTIAL_FOLDER = '.partial'
+READ_SIZE = 64 * 1024
+
+
+def partial_path(upload_id, folder=None):
+    return os.path.join(folder or upload_folder(), PARTIAL_FOLDER, upload_id)
+
+
+def append_chunk(path, offset, stream, limit):
+    # Copies the request body to `path` at `offset` in READ_SIZE pieces and
+    # returns (bytes written, body complete?). Reads stop at `limit` bytes;
+    # a longer body counts as incomplete. A dropped connection keeps what
+    # arrived, so the client can resume from there.
+    written = 0
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        try:
+            while written < limit:
+                data = stream.read(min(READ_SIZE, limit - written))
+                if not data:
+                    return written, True
+                f.write(data)
+                written += len(data)
+            return written, not stream.read(1)
+        except ClientDisconnected:
+            return written, False
+
+
+def file_sha256(path, size):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        remaining = size
+        while remaining:
+            data = f.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            digest.update(data)
+            remaining -= len(data)
+    return digest.hexdigest()
+
+
+def expire_upload_sessions(engine, folder, ttl, now=None):
+    # Deletes sessions idle for longer than `ttl` seconds with their partial
+    # files, and partial files without a session (e.g. after clear_db).
+    # Returns the number of partial files removed.
+    from app import UploadSession
+
+    sessions = UploadSession.__table__
+    cutoff = (now or datetime.now()) - timedelta(seconds=ttl)
+    with engine.begin() as conn:
+        conn.execute(sessions.delete().where(sessions.c.updated_at < cutoff))
+        live = set(conn.execute(sa.select(sessions.c.id)).scalars())
+
+    removed = 0
+    partial = os.path.join(folder, PARTIAL_FOLDER)
+    if not os.path.isdir(partial):
+        return removed
+    with os.scandir(partial) as entries:
+        for entry in entries:
+            if entry.name in live or not entry.is_file(follow_symlinks=False):
+                continue
+            # A session is inserted after its file is created, young files
+            # may belong to one that is being set up right now.
+            if datetime.fromtimestamp(entry.stat().st_mtime) > cutoff:
+                continue
+            try:
+                os.remove(entry.path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+    return removed
@@ -0,0 +1,41 @@
+import argparse
+import json
+
+from app import app
+from tenancy import create_shard, move_tenant
+
+# Needs TENANT_SHARD_MAP set, e.g.
+#   TENANT_SHARD_MAP=shards.json python shards.py create szkola-a
+#   TENANT_SHARD_MAP=shards.json python shards.py move szkola-a sqlite:////srv/shards/szkola-a.db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage per-school database shards")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="show the shard map")
+    create = commands.add_parser('create', help="create an empty shard for a school")
+    create.add_argument('school')
+    create.add_argument('uri', nargs='?', help="database URI, default sqlite:///shards/<school>.db")
+    move = commands.add_parser('move', help="copy a school to another database and switch to it")
+    move.add_argument('school')
+    move.add_argument('uri')
+    args = parser.parse_args()
+
+    if 'tenancy' not in app.extensions:
+        parser.error("TENANT_SHARD_MAP is not set")
+
+    with app.app_context():
+        if args.command == 'list':
+            print(json.dumps(app.extensions['tenancy'].shards.schools, indent=2, sort_keys=True))
+        elif args.command == 'create':
+            uri = create_shard(app, args.school, args.uri)
+            print(f"Created shard for {args.school}: {uri}")
+        elif args.command == 'move':
+            copied = move_tenant(app, args.school, args.uri)
+            for table, rows in copied.items():
+                print(f"  {table}: {rows} rows")
+            print(f"Moved {args.school} to {args.uri}; the old database can be removed.")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+import argparse
+import os
+import re
+import sqlite3
+import time
+
+import sqlalchemy as sa
+
+# Database snapshots for benchmark and staging environments. SQLite databases
+# are copied with VACUUM INTO, which reads one consistent snapshot under a
+# read lock: live readers are never blocked, writers wait for the copy to
+# finish before they can commit (the stepped online backup API restarts
+# whenever someone writes between steps, and on a busy database it never
+# finishes). Other databases are copied table by table into a SQLite file
+# (tenancy.copy_database).
+#
+#   python snapshot.py save seed-1m
+#   python snapshot.py restore seed-1m
+#   TENANT_SHARD_MAP=shards.json python snapshot.py save seed --school szkola-a
+
+SNAPSHOT_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+def snapshot_folder(app, school=None):
+    # Relative folders resolve against the instance folder; every school
+    # gets its own subfolder.
+    folder = app.config['SNAPSHOT_FOLDER']
+    if not os.path.isabs(folder):
+        folder = os.path.join(app.instance_path, folder)
+    return os.path.join(folder, school) if school else folder
+
+
+def snapshot_path(folder, name):
+    if not SNAPSHOT_NAME.match(name or ''):
+        raise ValueError(f"Invalid snapshot name: {name!r}")
+    return os.path.join(folder, f"{name}.db")
+
+
+def take_snapshot(engine, path):
+    # Written to a temp file and renamed, a failed snapshot never replaces
+    # a good one.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    if os.path.exists(tmp):
+        os.remove(tmp)
+    if engine.dialect.name == 'sqlite':
+        raw = engine.raw_connection()
+        try:
+            raw.driver_connection.execute("VACUUM INTO ?", (tmp,))
+        finally:
+            raw.close()
+    else:
+        from tenancy import copy_database
+
+        target = sa.create_engine(f"sqlite:///{tmp}")
+        try:
+            copy_database(engine, target)
+        finally:
+            target.dispose()
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+def restore_snapshot(engine, path):
+    # Replaces the whole database with the snapshot, then brings an older
+    # snapshot's schema up to date.
+    from migrations import upgrade
+
+    if not os.path.isfile(path):
+        raise FileNotFoundError(path)
+    if engine.dialect.name == 'sqlite':
+        source = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        raw = engine.raw_connection()
+        try:
+            # In one step: the destination is locked once and readers see
+            # either the old or the restored database.
+            source.backup(raw.driver_connection)
+        finally:
+            raw.close()
+            source.close()
+    else:
+        from app import db
+        from tenancy import copy_database
+
+        source = sa.create_engine(f"sqlite:///{path}")
+        try:
+            db.metadata.drop_all(engine)
+            copy_database(source, engine)
+        finally:
+            source.dispose()
+    return upgrade(engine)
+
+
+def list_snapshots(folder):
+    if not os.path.isdir(folder):
+        return []
+    snapshots = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            name, ext = os.path.splitext(entry.name)
+            if ext == '.db' and entry.is_file() and SNAPSHOT_NAME.match(name):
+                stat = entry.stat()
+                snapshots.append({"name": name, "size": stat.st_size, "created": stat.st_mtime})
+    return sorted(snapshots, key=lambda snapshot: snapshot["created"])
+
+
+def main():
+    from app import app, db
+
+    parser = argparse.ArgumentParser(description="Save and restore database snapshots")
+    commands = parser.add_subparsers(dest='command', required=True)
+    for command, text in (('save', "snapshot the database"), ('restore', "replace the database with a snapshot")):
+        sub = commands.add_parser(command, help=text)
+        sub.add_argument('name')
+        sub.add_argument('--school')
+    commands.add_parser('list', help="list snapshots").add_argument('--school')
+    args = parser.parse_args()
+
+    with app.app_context():
+        engine = db.engine
+        if args.school:
+            state = app.extensions['tenancy']
+            engine = state.engine_for(state.shards.get(args.school)['uri'])
+        folder = snapshot_folder(app, args.school)
+
+        start = time.perf_counter()
+        if args.command == 'save':
+            size = take_snapshot(engine, snapshot_path(folder, args.name))
+            print(f"Saved {args.name} ({size / 2**20:.1f} MiB) in {time.perf_counter() - start:.2f} s")
+        elif args.command == 'restore':
+            restore_snapshot(engine, snapshot_path(folder, args.name))
+            print(f"Restored {args.name} in {time.perf_counter() - start:.2f} s")
+        else:
+            for snapshot in list_snapshots(folder):
+                created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot["created"]))
+                print(f"  {snapshot['name']:30} {snapshot['size'] / 2**20:10.1f} MiB  {created}")
+
+
+if __name__ == '__main__':
+    main()
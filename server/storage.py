@@ -0,0 +1,117 @@
+import argparse
+import os
+import time
+
+import sqlalchemy as sa
+
+from app import app, db, ArchivedTask, StorageUsage, Task
+from resumable import expire_upload_sessions
+
+# Upload housekeeping. A new upload to the same task leaves the previous file
+# behind, and clear_db drops tasks but not their files; gc deletes files that
+# no task (live or archived) points to any more, and expired resumable
+# upload sessions with their partial files. Run it from the server directory,
+# file_path values are relative to it.
+#
+#   python storage.py gc --grace 3600 --dry-run
+#   python storage.py rebuild
+#   TENANT_SHARD_MAP=shards.json python storage.py gc --school szkola-a
+
+
+def referenced_files(engine):
+    paths = set()
+    with engine.connect() as conn:
+        for table in (Task.__table__, ArchivedTask.__table__):
+            result = conn.execution_options(yield_per=5000).execute(
+                sa.select(table.c.file_path).where(table.c.file_path.is_not(None)))
+            paths.update(os.path.abspath(path) for path in result.scalars())
+    return paths
+
+
+def collect_garbage(engine, folder, grace=3600, dry_run=False, now=None):
+    # Files younger than `grace` seconds stay: upload_file saves the file
+    # before the task row pointing to it is committed.
+    now = now or time.time()
+    if not os.path.isdir(folder):
+        return [], 0
+    referenced = referenced_files(engine)
+    removed, freed = [], 0
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            # Subfolders hold other schools' files (tenancy.py) or uploads in
+            # progress.
+            if entry.name.startswith('.') or not entry.is_file(follow_symlinks=False):
+                continue
+            stat = entry.stat(follow_symlinks=False)
+            if stat.st_mtime > now - grace or os.path.abspath(entry.path) in referenced:
+                continue
+            if not dry_run:
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    continue
+            removed.append(entry.name)
+            freed += stat.st_size
+    return removed, freed
+
+
+def rebuild_storage_usage(engine):
+    # Recomputes storage_usage from file_size, which track_storage_usage
+    # otherwise maintains incrementally; no filesystem walk.
+    branches = []
+    for table in (Task.__table__, ArchivedTask.__table__):
+        for owner in (table.c.student_id, table.c.teacher_id):
+            branches.append(sa.select(owner.label('user_id'), table.c.file_size.label('size'))
+                            .where(table.c.file_size.is_not(None)))
+    sizes = sa.union_all(*branches).subquery()
+    usage = StorageUsage.__table__
+    with engine.begin() as conn:
+        conn.execute(usage.delete())
+        conn.execute(usage.insert().from_select(
+            ['user_id', 'bytes', 'files'],
+            sa.select(sizes.c.user_id, sa.func.sum(sizes.c.size), sa.func.count()).group_by(sizes.c.user_id),
+        ))
+
+
+def targets(school=None):
+    # (label, engine, upload folder) for the app's database or every school.
+    folder = app.config['UPLOAD_FOLDER']
+    if 'tenancy' not in app.extensions:
+        return [("default database", db.engine, folder)]
+    state = app.extensions['tenancy']
+    schools = state.shards.schools
+    if school is not None:
+        if school not in schools:
+            raise SystemExit(f"Unknown school {school!r}")
+        schools = {school: schools[school]}
+    return [(name, state.engine_for(shard['uri']), os.path.join(folder, name))
+            for name, shard in sorted(schools.items())]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Upload garbage collection and storage accounting")
+    commands = parser.add_subparsers(dest='command', required=True)
+    gc = commands.add_parser('gc', help="delete uploaded files no task refers to")
+    gc.add_argument('--grace', type=float, default=3600, help="keep files younger than this many seconds")
+    gc.add_argument('--dry-run', action='store_true')
+    gc.add_argument('--school')
+    rebuild = commands.add_parser('rebuild', help="recompute per-user storage usage")
+    rebuild.add_argument('--school')
+    args = parser.parse_args()
+
+    with app.app_context():
+        for label, engine, folder in targets(args.school):
+            if args.command == 'gc':
+                removed, freed = collect_garbage(engine, folder, args.grace, args.dry_run)
+                verb = "Would remove" if args.dry_run else "Removed"
+                print(f"{label}: {verb} {len(removed)} files ({freed / 1024:.0f} KiB) from {folder}")
+                if not args.dry_run:
+                    expired = expire_upload_sessions(engine, folder, app.config['UPLOAD_SESSION_TTL'])
+                    print(f"{label}: removed {expired} partial files of expired upload sessions")
+            else:
+                rebuild_storage_usage(engine)
+                print(f"{label}: storage usage rebuilt")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,192 @@
+import json
+import os
+import re
+import threading
+import time
+
+from flask import current_app, g, jsonify, request, session
+import sqlalchemy as sa
+
+from db_routing import is_read_request, make_engine
+
+SCHOOL_NAME = re.compile(r'^[a-z0-9][a-z0-9_-]{0,62}$')
+
+# The shard map is a JSON file shared by all workers:
+#   {"szkola-a": {"uri": "sqlite:///shards/szkola-a.db", "read_only": false}, ...}
+# Each school lives in its own database, so load and data size grow per
+# school. shards.py creates shards and moves schools between them.
+
+
+class ShardMap:
+    def __init__(self, path, reload_interval=1.0):
+        self.path = path
+        self.reload_interval = reload_interval
+        self.schools = {}
+        self._mtime = None
+        self._checked = 0.0
+        self._lock = threading.Lock()
+        self.reload()
+
+    def reload(self):
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            schools = {}
+            if mtime is not None:
+                with open(self.path, encoding='utf-8') as f:
+                    schools = json.load(f)
+            self.schools, self._mtime = schools, mtime
+        self._checked = time.monotonic()
+
+    def get(self, school):
+        # Picks up edits made by shards.py in other processes, checking the
+        # file at most once per reload_interval.
+        if time.monotonic() - self._checked >= self.reload_interval:
+            with self._lock:
+                self.reload()
+        return self.schools.get(school)
+
+    def save(self, schools):
+        # Written to a temp file and renamed, so readers never see half a file.
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(schools, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+        with self._lock:
+            self.reload()
+
+
+class TenantRouter:
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TENANT_SHARD_MAP', None)
+        app.config.setdefault('TENANT_HEADER', 'X-School')
+        path = app.config['TENANT_SHARD_MAP']
+        if not path:
+            return
+        if not os.path.isabs(path):
+            path = os.path.join(app.instance_path, path)
+        app.extensions['tenancy'] = TenantState(app, ShardMap(path))
+        app.before_request(self._select_shard)
+
+    def _select_shard(self):
+        if request.method == 'OPTIONS':
+            return None
+        state = current_app.extensions['tenancy']
+        school = request.headers.get(current_app.config['TENANT_HEADER'])
+        if not school:
+            return jsonify({"message": "Missing school header"}), 400
+        shard = state.shards.get(school)
+        if shard is None:
+            return jsonify({"message": "Unknown school"}), 404
+        if shard.get('read_only') and not is_read_request():
+            response = jsonify({"message": "School is being moved, try again shortly"})
+            response.status_code = 503
+            response.headers['Retry-After'] = '5'
+            return response
+
+        # User ids are only unique within a shard, a login from another
+        # school must not carry over.
+        if session.get('_tenant') != school:
+            session.clear()
+            session['_tenant'] = school
+        g.tenant = school
+        g.tenant_engine = state.engine_for(shard['uri'])
+        return None
+
+
+class TenantState:
+    def __init__(self, app, shards):
+        self.app = app
+        self.shards = shards
+        self._engines = {}
+        self._lock = threading.Lock()
+
+    def engine_for(self, uri):
+        engine = self._engines.get(uri)
+        if engine is None:
+            with self._lock:
+                engine = self._engines.get(uri)
+                if engine is None:
+                    engine = self._engines[uri] = make_engine(self.app, uri)
+        return engine
+
+    def dispose(self, close=True):
+        for engine in self._engines.values():
+            engine.dispose(close=close)
+
+
+def upload_folder():
+    # Files of each school go to their own subfolder, task ids repeat across
+    # shards.
+    folder = current_app.config['UPLOAD_FOLDER']
+    tenant = g.get('tenant')
+    return os.path.join(folder, tenant) if tenant else folder
+
+
+def copy_database(source, target, batch_size=1000):
+    # Copies every table of the app's metadata in foreign-key order into an
+    # empty target; works for any pair of SQLAlchemy engines (SQLite files,
+    # schemas on a database server). Primary keys are kept as they are.
+    from app import db
+    from migrations import create_schema
+
+    create_schema(target)
+    copied = {}
+    with source.connect() as src, target.begin() as dst:
+        for table in db.metadata.sorted_tables:
+            copied[table.name] = 0
+            result = src.execution_options(yield_per=batch_size).execute(sa.select(table))
+            for rows in result.partitions():
+                dst.execute(table.insert(), [row._asdict() for row in rows])
+                copied[table.name] += len(rows)
+    return copied
+
+
+def create_shard(app, school, uri=None):
+    if not SCHOOL_NAME.match(school):
+        raise ValueError(f"Invalid school name: {school!r}")
+    state = app.extensions['tenancy']
+    state.shards.reload()
+    schools = dict(state.shards.schools)
+    if school in schools:
+        raise ValueError(f"School {school!r} already has a shard")
+
+    from migrations import create_schema
+
+    uri = uri or f"sqlite:///shards/{school}.db"
+    create_schema(state.engine_for(uri))
+    schools[school] = {"uri": uri, "read_only": False}
+    state.shards.save(schools)
+    return uri
+
+
+def move_tenant(app, school, uri, settle=None):
+    # Writes for the school are refused (503) while its data is copied, so
+    # nothing lands in the old shard after the copy started. `settle` gives
+    # every worker time to reload the map and finish in-flight writes.
+    state = app.extensions['tenancy']
+    state.shards.reload()
+    schools = dict(state.shards.schools)
+    if school not in schools:
+        raise ValueError(f"Unknown school {school!r}")
+    current = schools[school]
+
+    schools[school] = {**current, "read_only": True}
+    state.shards.save(schools)
+    try:
+        time.sleep(state.shards.reload_interval * 2 if settle is None else settle)
+        copied = copy_database(state.engine_for(current['uri']), state.engine_for(uri))
+    except Exception:
+        schools[school] = current
+        state.shards.save(schools)
+        raise
+    schools[school] = {"uri": uri, "read_only": False}
+    state.shards.save(schools)
+    return copied
@@ -0,0 +1,56 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app, db, User
+
+USERS = {
+    'admin': ("Ada", "Admin", "a@test.com"),
+    'teacher': ("Jan", "Nowak", "t@test.com"),
+    'student': ("Anna", "Kowalska", "s@test.com"),
+}
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    # make_app(seed, **config) builds an app on tmp_path/test.db (uploads in
+    # tmp_path/uploads, rate limits off) with one user per role in `roles`,
+    # ids in that order: teacher 1 and student 2 by default. seed(session)
+    # adds the rest of a module's data before the commit.
+    apps = []
+
+    def make(seed=None, roles=('teacher', 'student'), **config):
+        app = create_app({
+            'TESTING': True,
+            'RATELIMIT_ENABLED': False,
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+            'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+            **config,
+        })
+        with app.app_context():
+            db.create_all()
+            for role in roles:
+                name, surname, email = USERS[role]
+                db.session.add(User(name=name, surname=surname, email=email, password="x", role=role))
+            if seed is not None:
+                seed(db.session)
+            db.session.commit()
+        apps.append(app)
+        return app
+
+    yield make
+    for app in apps:
+        with app.app_context():
+            db.engine.dispose()
+        if 'read_engine' in app.extensions:
+            app.extensions['read_engine'].dispose()
+        if 'tenancy' in app.extensions:
+            app.extensions['tenancy'].dispose()
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
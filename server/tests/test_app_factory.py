@@ -0,0 +1,48 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+from app import create_app, db, User
+
+
+def test_create_app_applies_config(tmp_path):
+    uri = f"sqlite:///{tmp_path / 'factory.db'}"
+    app = create_app({'SQLALCHEMY_DATABASE_URI': uri, 'UPLOAD_FOLDER': str(tmp_path)})
+    assert app.config['SQLALCHEMY_DATABASE_URI'] == uri
+    assert app.config['UPLOAD_FOLDER'] == str(tmp_path)
+    assert 'api.get_tasks' in app.view_functions
+
+def test_create_app_does_not_touch_database(tmp_path):
+    path = tmp_path / 'factory.db'
+    create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}"})
+    assert not path.exists()
+
+def test_unsupported_database_is_rejected():
+    with pytest.raises(ValueError, match="Unsupported database 'mysql'"):
+        create_app({'SQLALCHEMY_DATABASE_URI': "mysql://user@localhost/changeItXD"})
+
+def test_apps_are_isolated(tmp_path):
+    first = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'first.db'}"})
+    second = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'second.db'}"})
+    with first.app_context():
+        db.create_all()
+        db.session.add(User(name="Jan", surname="Nowak", email="a@test.com", password="x", role="student"))
+        db.session.commit()
+    with second.app_context():
+        assert not sa.inspect(db.engine).has_table('user')
+    with first.app_context():
+        assert User.query.count() == 1
+        db.engine.dispose()
+
+def test_extension_state_is_per_app(tmp_path):
+    first = create_app({'PROFILE_FOLDER': str(tmp_path / 'first'), 'RATELIMIT_LIMITS': {'api.login': (1, 60)}})
+    second = create_app({'PROFILE_FOLDER': str(tmp_path / 'second'), 'IDEMPOTENCY_ENDPOINTS': set()})
+    assert first.extensions['profiler'].store.folder == str(tmp_path / 'first')
+    assert second.extensions['profiler'].store.folder == str(tmp_path / 'second')
+    assert set(first.extensions['rate_limiter'].limits) == {'api.login'}
+    assert 'api.get_tasks' in second.extensions['rate_limiter'].limits
+    assert first.extensions['rate_limiter'].store is not second.extensions['rate_limiter'].store
+    assert first.extensions['idempotency'].endpoints == {'api.create_task', 'api.mark_task_completed', 'api.upload_file'}
+    assert second.extensions['idempotency'].endpoints == set()
+    assert first.extensions['idempotency'].store is not second.extensions['idempotency'].store
@@ -0,0 +1,91 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import db, ArchivedTask, Assignment, Task
+from archive import archive_graded_tasks, table_size
+
+
+def seed(session):
+    old = Assignment(teacher_id=1, content="Stare", due_date=datetime(2024, 1, 10), max_points=10)
+    new = Assignment(teacher_id=1, content="Nowe", due_date=datetime(2030, 1, 10), max_points=10)
+    session.add_all([
+        Task(assignment=old, student_id=2, teacher_id=1, completed=True, grade=8),
+        Task(assignment=old, student_id=2, teacher_id=1, completed=True, grade=None),
+        Task(assignment=old, student_id=2, teacher_id=1, completed=True, grade=6),
+        Task(assignment=new, student_id=2, teacher_id=1, completed=True, grade=9),
+    ])
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed)
+
+def archive(app, batch_size=500):
+    with app.app_context():
+        return archive_graded_tasks(db.engine, datetime(2025, 1, 1), batch_size)
+
+def test_archives_only_graded_past_tasks(app):
+    assert archive(app, batch_size=1) == 2
+    with app.app_context():
+        assert [task.id for task in Task.query.order_by(Task.id)] == [2, 4]
+        archived = ArchivedTask.query.order_by(ArchivedTask.id).all()
+        assert [(task.id, task.grade) for task in archived] == [(1, 8), (3, 6)]
+        assert all(task.archived_at for task in archived)
+        assert table_size(db.engine, 'task')[0] == 2
+    assert archive(app) == 0
+
+def test_newest_task_is_kept_so_ids_are_not_reused(app, client):
+    with app.app_context():
+        db.session.get(Task, 4).assignment.due_date = datetime(2024, 1, 10)
+        db.session.commit()
+    assert archive(app) == 2
+    with app.app_context():
+        assert [task.id for task in Task.query.order_by(Task.id)] == [2, 4]
+
+    response = client.post('/tasks', json={
+        'teacher_id': 1, 'student_id': 2, 'content': "Kolejne", 'due_date': "2030-02-01", 'max_points': 5
+    })
+    assert response.status_code == 201
+    with app.app_context():
+        new_id = db.session.query(db.func.max(Task.id)).scalar()
+        assert new_id == 5
+        assert db.session.get(ArchivedTask, new_id) is None
+
+def test_task_details_fall_back_to_archive(app, client):
+    archive(app)
+    response = client.get('/task/1', query_string={'user_id': 2, 'role': 'student'})
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["content"], data["grade"], data["archived"]) == ("Stare", 8, True)
+    assert client.get('/task/2', query_string={'user_id': 2, 'role': 'student'}).get_json()["archived"] is False
+
+def test_task_list_includes_archive(app, client):
+    archive(app)
+    tasks = client.get('/tasks', query_string={'user_id': 2, 'role': 'student'}).get_json()
+    assert sorted((task['id'], task['archived']) for task in tasks) == [(1, True), (2, False), (3, True), (4, False)]
+
+    live = client.get('/tasks', query_string={'user_id': 1, 'role': 'teacher', 'include_archived': 'false'})
+    assert [task['id'] for task in live.get_json()] == [2, 4]
+
+def test_assignment_stats_count_archived_tasks(app, client):
+    archive(app)
+    stats = client.get('/assignments', query_string={'teacher_id': 1}).get_json()
+    assert [(row['content'], row['students'], row['graded']) for row in stats] == [
+        ("Stare", 3, 2), ("Nowe", 1, 1)]
+
+def test_sync_after_archiving_the_last_change(app, client):
+    with app.app_context():
+        # Graded last, so task 3 holds the highest change_seq when archived.
+        db.session.get(Task, 3).grade = 7
+        db.session.commit()
+    changes = {'user_id': 2, 'role': 'student'}
+    cursor = client.get('/tasks/changes', query_string=changes).get_json()["cursor"]
+    assert archive(app) == 2
+
+    with app.app_context():
+        db.session.get(Task, 2).answer = "Poprawione"
+        db.session.commit()
+        assert db.session.get(Task, 2).change_seq > cursor
+    response = client.get('/tasks/changes', query_string={**changes, 'since': cursor})
+    assert [task["id"] for task in response.get_json()["tasks"]] == [2]
@@ -0,0 +1,149 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+from app import create_app, db, Assignment, Task, User
+
+
+def seed(session):
+    for i in range(1, 3):
+        session.add(User(name="Uczen", surname=str(i), email=f"s{i}@test.com", password="x", role="student"))
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed)
+
+def create_assignment(client, student_ids, content="Wypracowanie"):
+    return client.post('/assignments', json={
+        'teacher_id': 1,
+        'student_ids': student_ids,
+        'content': content,
+        'due_date': "2030-06-01",
+        'max_points': 20
+    })
+
+def test_create_assignment_shares_definition(app, client):
+    response = create_assignment(client, [2, 3, 4])
+    assert response.status_code == 201
+    assignment_id = response.get_json()["assignment_id"]
+    with app.app_context():
+        assert Assignment.query.count() == 1
+        tasks = Task.query.order_by(Task.student_id).all()
+        assert [task.student_id for task in tasks] == [2, 3, 4]
+        assert all(task.assignment_id == assignment_id for task in tasks)
+
+    for student_id in (2, 3, 4):
+        tasks = client.get('/tasks', query_string={'user_id': student_id, 'role': 'student'}).get_json()
+        assert [(task['content'], task['due_date'], task['max_points']) for task in tasks] == [
+            ("Wypracowanie", "2030-06-01", 20)]
+
+def test_create_assignment_validation(client):
+    assert create_assignment(client, []).status_code == 400
+    response = create_assignment(client, [2, 1])
+    assert response.status_code == 404
+    assert response.get_json()["message"] == "Student not found"
+
+def test_update_assignment_is_single_row_update(app, client):
+    assignment_id = create_assignment(client, [2, 3, 4]).get_json()["assignment_id"]
+    statements = []
+    with app.app_context():
+        engine = db.engine
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+    sa.event.listen(engine, 'before_cursor_execute', record)
+    try:
+        response = client.put(f'/assignments/{assignment_id}', json={'teacher_id': 1, 'content': "Nowa tresc"})
+    finally:
+        sa.event.remove(engine, 'before_cursor_execute', record)
+    assert response.status_code == 200
+    assert [s for s in statements if s.startswith("UPDATE")] == [s for s in statements if s.startswith("UPDATE assignment")]
+    assert len([s for s in statements if s.startswith("UPDATE")]) == 1
+
+    tasks = client.get('/tasks', query_string={'user_id': 1, 'role': 'teacher'}).get_json()
+    assert {task['content'] for task in tasks} == {"Nowa tresc"}
+
+def test_update_assignment_unauthorized(client):
+    assignment_id = create_assignment(client, [2]).get_json()["assignment_id"]
+    response = client.put(f'/assignments/{assignment_id}', json={'teacher_id': 2, 'content': "x"})
+    assert response.status_code == 403
+
+def test_assignment_edit_shows_up_in_changes(client):
+    assignment_id = create_assignment(client, [2, 3, 4]).get_json()["assignment_id"]
+    create_assignment(client, [2], content="Inne")
+    cursor = client.get('/tasks/changes', query_string={'user_id': 1, 'role': 'teacher'}).get_json()["cursor"]
+
+    client.put(f'/assignments/{assignment_id}', json={'teacher_id': 1, 'max_points': 25})
+    data = client.get('/tasks/changes', query_string={
+        'user_id': 1, 'role': 'teacher', 'since': cursor, 'limit': 2}).get_json()
+    assert sorted(task['id'] for task in data['tasks']) == [1, 2, 3]
+    assert {task['max_points'] for task in data['tasks']} == {25}
+
+    data = client.get('/tasks/changes', query_string={'user_id': 2, 'role': 'student', 'since': cursor}).get_json()
+    assert [task['id'] for task in data['tasks']] == [1]
+
+def test_assignment_statistics(client):
+    assignment_id = create_assignment(client, [2, 3, 4]).get_json()["assignment_id"]
+    create_assignment(client, [2], content="Inne")
+    client.post('/task/complete/1', json={'student_id': 2, 'answer': "a"})
+    client.post('/task/complete/2', json={'student_id': 3, 'answer': "b"})
+    client.post('/task/grade/1', json={'teacher_id': 1, 'grade': 15})
+    client.post('/task/grade/2', json={'teacher_id': 1, 'grade': 20})
+
+    stats = client.get('/assignments', query_string={'teacher_id': 1}).get_json()
+    assert stats[0] == {
+        "id": assignment_id,
+        "content": "Wypracowanie",
+        "due_date": "2030-06-01",
+        "max_points": 20,
+        "students": 3,
+        "completed": 2,
+        "graded": 2,
+        "average_grade": 17.5
+    }
+    assert (stats[1]["students"], stats[1]["completed"], stats[1]["average_grade"]) == (1, 0, None)
+
+def test_task_constructor_creates_private_assignment(app):
+    with app.app_context():
+        task = Task(content="Solo", student_id=2, teacher_id=1, due_date=datetime(2030, 1, 1), max_points=5)
+        db.session.add(task)
+        db.session.commit()
+        assert task.assignment.teacher_id == 1
+        assert (task.content, task.max_points) == ("Solo", 5)
+
+def test_upgrade_moves_task_definitions(tmp_path):
+    from migrations import upgrade
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'legacy.db'}"})
+    with app.app_context():
+        with db.engine.begin() as conn:
+            # schema as created by earlier versions of app.py
+            conn.execute(sa.text(
+                "CREATE TABLE task (id INTEGER PRIMARY KEY, content VARCHAR(200) NOT NULL, "
+                "student_id INTEGER NOT NULL, teacher_id INTEGER NOT NULL, completed BOOLEAN, "
+                "due_date DATETIME, sent_date DATETIME, answer VARCHAR(200), max_points INTEGER, "
+                "grade INTEGER, comment VARCHAR(200), file_path VARCHAR(255))"
+            ))
+            conn.execute(sa.text(
+                "INSERT INTO task (content, student_id, teacher_id, due_date, max_points, grade) VALUES "
+                "('A', 2, 1, '2030-01-01 00:00:00.000000', 10, 7), "
+                "('A', 3, 1, '2030-01-01 00:00:00.000000', 10, NULL), "
+                "('A', 4, 1, NULL, 10, NULL), "
+                "('B', 2, 1, NULL, NULL, NULL)"
+            ))
+        db.create_all()
+
+        assert 'move_task_definitions_to_assignments' in upgrade()
+        assert upgrade() == []
+        assert Assignment.query.count() == 3
+        tasks = Task.query.order_by(Task.id).all()
+        assert tasks[0].assignment_id == tasks[1].assignment_id != tasks[2].assignment_id
+        assert [(t.content, t.due_date, t.max_points, t.grade) for t in tasks] == [
+            ("A", datetime(2030, 1, 1), 10, 7),
+            ("A", datetime(2030, 1, 1), 10, None),
+            ("A", None, 10, None),
+            ("B", None, None, None),
+        ]
+        columns = {column['name'] for column in sa.inspect(db.engine).get_columns('task')}
+        assert 'content' not in columns and 'change_seq' in columns
+        db.engine.dispose()
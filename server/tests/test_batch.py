@@ -0,0 +1,69 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import Task
+
+
+def seed(session):
+    session.add_all([
+        Task(content=f"Zadanie {i}", student_id=2, teacher_id=1, due_date=datetime(2030, 1, 1), max_points=10)
+        for i in range(2)
+    ])
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed, BATCH_MAX_REQUESTS=5)
+
+DASHBOARD = [
+    {"id": "tasks", "path": "/tasks?user_id=1&role=teacher"},
+    {"id": "students", "path": "/students"},
+    {"id": "task-1", "path": "/task/1?user_id=1&role=teacher"},
+    {"id": "task-9", "path": "/task/9?user_id=1&role=teacher"},
+]
+
+@pytest.mark.parametrize('parallel', [False, True])
+def test_batch_runs_get_requests(client, parallel):
+    response = client.post('/batch', json={"requests": DASHBOARD, "parallel": parallel})
+    assert response.status_code == 200
+    responses = {item["id"]: item for item in response.get_json()["responses"]}
+    assert [item["id"] for item in response.get_json()["responses"]] == ["tasks", "students", "task-1", "task-9"]
+
+    assert responses["tasks"]["status"] == 200
+    assert responses["tasks"]["body"] == client.get('/tasks?user_id=1&role=teacher').get_json()
+    assert responses["students"]["body"] == [{"id": 2, "name": "Anna Kowalska"}]
+    assert responses["task-1"]["body"]["content"] == "Zadanie 0"
+    assert responses["task-9"]["status"] == 404
+
+def test_batch_rejects_writes_and_bad_items(client):
+    response = client.post('/batch', json={"requests": [
+        {"path": "/tasks", "method": "POST"},
+        {"path": "tasks"},
+        "/students",
+        {"path": "/nope"},
+    ]})
+    statuses = [item["status"] for item in response.get_json()["responses"]]
+    assert statuses == [405, 400, 400, client.get('/nope').status_code]
+
+def test_batch_limits(client):
+    assert client.post('/batch', json={}).status_code == 400
+    response = client.post('/batch', json={"requests": [{"path": "/students"}] * 6})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "At most 5 requests per batch"
+
+def test_batch_sub_requests_are_rate_limited(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', True)
+    limiter = app.extensions['rate_limiter']
+    limiter.store.clear()
+    monkeypatch.setitem(limiter.limits, 'api.get_tasks', (1 / 60, 2.0))
+    response = client.post('/batch', json={"requests": [{"path": "/tasks?user_id=1&role=teacher"}] * 3})
+    assert [item["status"] for item in response.get_json()["responses"]] == [200, 200, 429]
+    limiter.store.clear()
+
+def test_batch_failing_sub_request_does_not_break_others(app, client, monkeypatch):
+    def broken():
+        raise RuntimeError("boom")
+    monkeypatch.setitem(app.view_functions, 'api.get_students', broken)
+    response = client.post('/batch', json={"requests": [{"path": "/students"}, {"path": "/tasks?user_id=2&role=student"}]})
+    assert [item["status"] for item in response.get_json()["responses"]] == [500, 200]
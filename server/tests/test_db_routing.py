@@ -0,0 +1,84 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+from app import db, Task
+
+
+def seed(session):
+    session.add(Task(content="Task", student_id=2, teacher_id=1, due_date=datetime.now(), max_points=10))
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(seed, SQLALCHEMY_READ_URI=f"sqlite:///file:{tmp_path / 'test.db'}?mode=ro&uri=true")
+
+@pytest.fixture
+def statements(app):
+    counts = {'primary': 0, 'read': 0}
+    with app.app_context():
+        engines = {'primary': db.engine, 'read': app.extensions['read_engine']}
+    listeners = []
+    for name, engine in engines.items():
+        def count(*args, name=name):
+            counts[name] += 1
+        sa.event.listen(engine, 'before_cursor_execute', count)
+        listeners.append((engine, count))
+    yield counts
+    for engine, count in listeners:
+        sa.event.remove(engine, 'before_cursor_execute', count)
+
+def test_get_requests_use_read_bind(app, statements):
+    response = app.test_client().get('/tasks', query_string={'user_id': 1, 'role': 'teacher'})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 1
+    assert statements['read'] > 0
+    assert statements['primary'] == 0
+
+def test_writes_use_primary(app, statements):
+    response = app.test_client().post('/task/complete/1', json={'student_id': 2, 'answer': "42"})
+    assert response.status_code == 200
+    assert statements['primary'] > 0
+    assert statements['read'] == 0
+
+def test_read_only_bind_rejects_writes(app):
+    with pytest.raises(sa.exc.OperationalError):
+        with app.extensions['read_engine'].begin() as conn:
+            conn.execute(sa.text("DELETE FROM task"))
+
+def test_read_your_writes_pins_client_to_primary(app, statements):
+    client = app.test_client()
+    client.post('/task/complete/1', json={'student_id': 2, 'answer': "42"})
+    statements.update(primary=0, read=0)
+
+    response = client.get('/task/1', query_string={'user_id': 2, 'role': 'student'})
+    assert response.get_json()['answer'] == "42"
+    assert statements['read'] == 0
+
+    app.test_client().get('/task/1', query_string={'user_id': 2, 'role': 'student'})
+    assert statements['read'] > 0
+
+def test_relative_sqlite_read_uri_uses_instance_folder(app):
+    from db_routing import make_engine
+    engine = make_engine(app, "sqlite:///file:changeItXD.db?mode=ro&uri=true")
+    assert engine.url.database == f"file:{os.path.join(app.instance_path, 'changeItXD.db')}"
+    assert engine.url.query['mode'] == 'ro'
+
+def test_read_your_writes_disabled(app, statements):
+    app.config['READ_YOUR_WRITES_SECONDS'] = 0
+    client = app.test_client()
+    client.post('/task/complete/1', json={'student_id': 2, 'answer': "42"})
+    statements.update(primary=0, read=0)
+    client.get('/task/1', query_string={'user_id': 2, 'role': 'student'})
+    assert statements['primary'] == 0
+
+def test_batch_reads_use_read_bind_without_pinning(app, statements):
+    client = app.test_client()
+    response = client.post('/batch', json={"requests": [{"path": "/tasks?user_id=1&role=teacher"}]})
+    assert response.get_json()["responses"][0]["status"] == 200
+    assert statements['read'] > 0
+    assert statements['primary'] == 0
+
+    client.get('/students')
+    assert statements['primary'] == 0
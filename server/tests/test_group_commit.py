@@ -0,0 +1,121 @@
+import pytest
+import sys
+import os
+import io
+import threading
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+from app import db, group_commit, StorageUsage, Task, User
+
+TASKS = 20
+
+
+def seed(session):
+    session.add_all([User(name="Uczen", surname=str(i), email=f"s{i}@test.com", password="x", role="student")
+                     for i in range(1, TASKS)])
+    session.add_all([Task(content=f"Zadanie {i}", student_id=i + 2, teacher_id=1,
+                          due_date=datetime(2030, 1, 1), max_points=10) for i in range(TASKS)])
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed, GROUP_COMMIT_WINDOW=0.05)
+
+def count_commits(app):
+    commits = []
+    with app.app_context():
+        sa.event.listen(db.engine, 'commit', lambda conn: commits.append(1))
+    return commits
+
+def in_threads(count, target):
+    barrier = threading.Barrier(count)
+    results = [None] * count
+
+    def run(i):
+        barrier.wait()
+        results[i] = target(i)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_submissions_share_a_commit(app):
+    commits = count_commits(app)
+
+    def submit(i):
+        response = app.test_client().post(f'/task/complete/{i + 1}', json={"student_id": i + 2, "answer": f"Odpowiedz {i}"})
+        return response.status_code
+
+    assert in_threads(TASKS, submit) == [200] * TASKS
+    assert len(commits) < TASKS
+    with app.app_context():
+        tasks = Task.query.order_by(Task.id).all()
+        assert all(task.completed for task in tasks)
+        assert [task.answer for task in tasks] == [f"Odpowiedz {i}" for i in range(TASKS)]
+        # bump_change_seq still gives every write its own value.
+        assert len({task.change_seq for task in tasks}) == TASKS
+
+def test_failed_write_only_fails_its_caller(app):
+    def submit(i):
+        def write(session):
+            session.get(Task, i + 1).answer = f"Odpowiedz {i}"
+            if i == 3:
+                raise ValueError("broken")
+            return i
+
+        with app.app_context():
+            try:
+                return group_commit.submit(db.engine, write)
+            except ValueError as exc:
+                return exc
+
+    results = in_threads(8, submit)
+    assert isinstance(results[3], ValueError)
+    assert [result for i, result in enumerate(results) if i != 3] == [0, 1, 2, 4, 5, 6, 7]
+    with app.app_context():
+        answers = [task.answer for task in Task.query.order_by(Task.id).limit(8)]
+        assert answers == [None if i == 3 else f"Odpowiedz {i}" for i in range(8)]
+
+def test_failed_commit_fails_the_group(app, monkeypatch):
+    def commit(conn):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(sa.engine.Connection, 'commit', commit)
+
+    def submit(i):
+        def write(session):
+            session.get(Task, i + 1).answer = "Odpowiedz"
+
+        with app.app_context():
+            try:
+                group_commit.submit(db.engine, write)
+            except RuntimeError as exc:
+                return str(exc)
+
+    assert in_threads(4, submit) == ["disk full"] * 4
+    with app.app_context():
+        assert Task.query.filter(Task.answer.is_not(None)).count() == 0
+
+def test_uploads_are_grouped_with_storage_usage(app):
+    commits = count_commits(app)
+
+    def upload(i):
+        data = {"student_id": str(i + 2), "file": (io.BytesIO(b"x" * (i + 1)), f"praca{i}.txt")}
+        return app.test_client().post(f'/upload/{i + 1}', data=data, content_type='multipart/form-data').status_code
+
+    assert in_threads(TASKS, upload) == [200] * TASKS
+    assert len(commits) < TASKS
+    with app.app_context():
+        assert all(task.file_size == task.id for task in Task.query.all())
+        assert db.session.get(StorageUsage, 1).bytes == sum(range(1, TASKS + 1))
+
+def test_disabled(app):
+    app.config['GROUP_COMMIT_ENABLED'] = False
+    commits = count_commits(app)
+    client = app.test_client()
+    assert client.post('/task/complete/1', json={"student_id": 2, "answer": "Odpowiedz"}).status_code == 200
+    assert client.post('/task/complete/2', json={"student_id": 2, "answer": "Odpowiedz"}).status_code == 403
+    assert len(commits) == 1
@@ -0,0 +1,129 @@
+import pytest
+import sys
+import os
+import threading
+from io import BytesIO
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app, db, Task
+from idempotency import BUSY, CLAIMED, MISMATCH, REPLAY, MemoryResponseStore, SqliteResponseStore
+
+
+def create_task(client, key, content="Zadanie"):
+    return client.post('/tasks', headers={'Idempotency-Key': key}, json={
+        'teacher_id': 1, 'student_id': 2, 'content': content, 'due_date': "2030-01-01", 'max_points': 10
+    })
+
+def test_retry_returns_stored_response(app, client):
+    first = create_task(client, "abc")
+    assert first.status_code == 201
+    assert 'Idempotent-Replayed' not in first.headers
+
+    retry = create_task(client, "abc")
+    assert retry.status_code == 201
+    assert retry.get_json() == first.get_json()
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        assert Task.query.count() == 1
+
+    assert create_task(client, "other").status_code == 201
+    with app.app_context():
+        assert Task.query.count() == 2
+
+def test_requests_without_key_are_not_deduplicated(app, client):
+    for _ in range(2):
+        client.post('/tasks', json={
+            'teacher_id': 1, 'student_id': 2, 'content': "Zadanie", 'due_date': "2030-01-01", 'max_points': 10
+        })
+    with app.app_context():
+        assert Task.query.count() == 2
+
+def test_key_reused_for_other_payload(client):
+    assert create_task(client, "abc").status_code == 201
+    response = create_task(client, "abc", content="Inne")
+    assert response.status_code == 422
+
+def test_invalid_key(client):
+    assert create_task(client, "").status_code == 400
+    assert create_task(client, "x" * 300).status_code == 400
+
+def test_failed_request_can_be_retried(app, client, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("database is locked")
+    with monkeypatch.context() as patch:
+        patch.setattr(db.session, 'commit', fail)
+        with pytest.raises(RuntimeError):
+            create_task(client, "abc")
+    assert create_task(client, "abc").status_code == 201
+    with app.app_context():
+        assert Task.query.count() == 1
+
+def test_upload_retry_with_new_boundary(app, client):
+    create_task(client, "task")
+    for _ in range(2):
+        response = client.post('/upload/1', headers={'Idempotency-Key': "upload"}, data={
+            'student_id': '2', 'file': (BytesIO(b"tresc"), 'praca.txt')
+        }, content_type='multipart/form-data')
+        assert response.status_code == 200
+    assert response.headers['Idempotent-Replayed'] == 'true'
+
+    response = client.post('/upload/1', headers={'Idempotency-Key': "upload"}, data={
+        'student_id': '2', 'file': (BytesIO(b"inna tresc"), 'praca.txt')
+    }, content_type='multipart/form-data')
+    assert response.status_code == 422
+
+def test_memory_store_waits_for_first_request():
+    store = MemoryResponseStore()
+    assert store.begin("k", "f", 1) == (CLAIMED, None)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(store.begin("k", "f", 5)))
+    waiter.start()
+    store.finish("k", (201, "application/json", b"{}"))
+    waiter.join()
+    assert results == [(REPLAY, (201, "application/json", b"{}"))]
+    assert store.begin("k", "g", 1) == (MISMATCH, None)
+
+def test_memory_store_abandon_hands_key_over():
+    store = MemoryResponseStore()
+    store.begin("k", "f", 1)
+    assert store.begin("k", "f", 0.01) == (BUSY, None)
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(store.begin("k", "f", 5)))
+    waiter.start()
+    store.abandon("k")
+    waiter.join()
+    assert results == [(CLAIMED, None)]
+
+def test_memory_store_expires_entries():
+    now = [0.0]
+    store = MemoryResponseStore(ttl=10, clock=lambda: now[0])
+    store.begin("k", "f", 1)
+    store.finish("k", (200, "text/plain", b"ok"))
+    now[0] = 11.0
+    assert store.begin("k", "f", 1) == (CLAIMED, None)
+
+def test_sqlite_store_shared_between_instances(tmp_path):
+    path = str(tmp_path / "responses.db")
+    first = SqliteResponseStore(path)
+    second = SqliteResponseStore(path, poll_interval=0.01)
+    assert first.begin("k", "f", 1) == (CLAIMED, None)
+    assert second.begin("k", "f", 0.02) == (BUSY, None)
+    first.finish("k", (200, "text/plain", b"ok"))
+    assert second.begin("k", "f", 1) == (REPLAY, (200, "text/plain", b"ok"))
+    assert second.begin("k", "g", 1) == (MISMATCH, None)
+
+def test_retry_on_another_worker_is_replayed(app, tmp_path, monkeypatch):
+    # Two workers of one deployment, configured through the environment.
+    monkeypatch.setenv('IDEMPOTENCY_STORAGE_PATH', str(tmp_path / 'responses.db'))
+    config = {'RATELIMIT_ENABLED': False, 'SQLALCHEMY_DATABASE_URI': app.config['SQLALCHEMY_DATABASE_URI']}
+    first, second = create_app(config), create_app(config)
+    assert isinstance(first.extensions['idempotency'].store, SqliteResponseStore)
+
+    assert create_task(first.test_client(), "abc").status_code == 201
+    retry = create_task(second.test_client(), "abc")
+    assert retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    with app.app_context():
+        assert Task.query.count() == 1
+    for worker in (first, second):
+        with worker.app_context():
+            db.engine.dispose()
@@ -0,0 +1,125 @@
+import pytest
+import sys
+import os
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+from app import profiler, Task
+from profiling import ProfileStore, collapsed_stacks
+
+
+def seed(session):
+    session.add_all([Task(content=f"Zadanie {i}", student_id=3, teacher_id=2,
+                          due_date=datetime(2030, 1, 1), max_points=10) for i in range(200)])
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(seed, roles=('admin', 'teacher', 'student'), PROFILE_FOLDER=str(tmp_path / 'profiles'), PROFILE_INTERVAL=0.001)
+
+def listening():
+    return sa.event.contains(sa.engine.Engine, 'after_cursor_execute', profiler._after_execute)
+
+def test_requests_are_not_profiled_by_default(client, tmp_path):
+    response = client.get('/tasks?user_id=3&role=student')
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+    assert not os.path.exists(tmp_path / 'profiles')
+    assert not listening()
+
+def test_admin_profiles_a_request(client):
+    response = client.get('/tasks?user_id=3&role=student', headers={'X-Profile': '1'})
+    assert response.status_code == 200
+    assert len(response.get_json()) == 200
+    profile_id = response.headers['X-Profile-Id']
+    assert not listening()
+
+    profile = client.get(f'/profiles/{profile_id}?admin_id=1').get_json()
+    assert profile["trigger"] == 'admin'
+    assert profile["endpoint"] == 'api.get_tasks'
+    assert profile["status"] == 200
+    assert sum(profile["stacks"].values()) == profile["samples"]
+    assert any('FROM task' in query["statement"] for query in profile["sql"])
+    assert profile["sql_ms"] == pytest.approx(sum(query["ms"] for query in profile["sql"]), abs=0.01)
+
+    listed = client.get('/profiles?admin_id=1').get_json()
+    assert [entry["id"] for entry in listed] == [profile_id]
+    assert listed[0]["sql_count"] == len(profile["sql"])
+
+def test_query_flag_needs_an_admin(client):
+    response = client.get('/tasks?user_id=3&role=student&profile=2')
+    assert response.status_code == 200
+    assert 'X-Profile-Id' not in response.headers
+
+    response = client.get('/tasks?user_id=3&role=student&profile=1')
+    assert 'X-Profile-Id' in response.headers
+
+    assert client.get('/profiles?admin_id=2').status_code == 403
+    assert client.get(f"/profiles/{response.headers['X-Profile-Id']}?admin_id=3").status_code == 403
+
+def test_sampled_requests(app, client):
+    app.config['PROFILE_SAMPLE_RATE'] = 1.0
+    response = client.get('/tasks?user_id=3&role=student')
+    profile = client.get(f"/profiles/{response.headers['X-Profile-Id']}?admin_id=1").get_json()
+    assert profile["trigger"] == 'sample'
+
+def test_flamegraph_download(client):
+    profile_id = client.get('/tasks?user_id=3&role=student', headers={'X-Profile': '1'}).headers['X-Profile-Id']
+    profile = client.get(f'/profiles/{profile_id}?admin_id=1').get_json()
+
+    response = client.get(f'/profiles/{profile_id}/flamegraph?admin_id=1')
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert f'profile-{profile_id}.folded' in response.headers['Content-Disposition']
+    lines = response.get_data(as_text=True).splitlines()
+    assert len(lines) == len(profile["stacks"])
+    assert sum(int(line.rsplit(' ', 1)[1]) for line in lines) == profile["samples"]
+    assert client.get('/profiles/nope/flamegraph?admin_id=1').status_code == 404
+
+def test_batch_is_one_profile(app, client):
+    requests = [{"path": "/students"}, {"path": "/tasks?user_id=3&role=student"}]
+    response = client.post('/batch', headers={'X-Profile': '1'}, json={"requests": requests})
+    assert [item["status"] for item in response.get_json()["responses"]] == [200, 200]
+    profile = client.get(f"/profiles/{response.headers['X-Profile-Id']}?admin_id=1").get_json()
+    assert profile["endpoint"] == 'api.batch'
+    assert any('FROM task' in query["statement"] for query in profile["sql"])
+    assert [entry["id"] for entry in client.get('/profiles?admin_id=1').get_json()] == [profile["id"]]
+
+def test_nested_profiles(app, client):
+    # A sampled sub-request gets its own profile, the batch keeps its own.
+    app.config['PROFILE_SAMPLE_RATE'] = 1.0
+    response = client.post('/batch', json={"requests": [{"path": "/students"}, {"path": "/students"}]})
+    app.config['PROFILE_SAMPLE_RATE'] = 0.0
+    profiles = client.get('/profiles?admin_id=1').get_json()
+    assert sorted(profile["path"] for profile in profiles) == ['/batch', '/students', '/students']
+    outer = client.get(f"/profiles/{response.headers['X-Profile-Id']}?admin_id=1").get_json()
+    assert outer["path"] == '/batch'
+    assert len(outer["sql"]) >= 2
+    assert not listening()
+
+def test_admin_check_is_passed_in(tmp_path):
+    # Nothing is imported from app: run as `python3 app.py`, that would be
+    # a second copy of the module with its own db.
+    from flask import Flask
+    from profiling import Profiler
+
+    app = Flask(__name__)
+    app.config['PROFILE_FOLDER'] = str(tmp_path / 'profiles')
+    Profiler().init_app(app, authorize=lambda admin_id: admin_id == '7')
+    app.add_url_rule('/ping', 'ping', lambda: "pong")
+    client = app.test_client()
+    assert 'X-Profile-Id' in client.get('/ping', headers={'X-Profile': '7'}).headers
+    assert 'X-Profile-Id' not in client.get('/ping', headers={'X-Profile': '8'}).headers
+
+def test_collapsed_stacks():
+    profile = {"stacks": {"wsgi.main:1;app.view:3": 2, "wsgi.main:1": 1}}
+    assert collapsed_stacks(profile) == "wsgi.main:1 1\nwsgi.main:1;app.view:3 2\n"
+
+def test_store_keeps_newest_profiles(tmp_path):
+    store = ProfileStore(str(tmp_path), max_profiles=3)
+    for i in range(5):
+        store.save({"id": f"p{i}", "stacks": {}})
+        os.utime(tmp_path / f"p{i}.json", ns=(i * 10**9, i * 10**9))
+    store.save({"id": "p5", "stacks": {}})
+    assert [profile["id"] for profile in store.list()] == ["p5", "p4", "p3"]
+    assert store.get("p0") is None
+    assert store.get("../p4") is None
@@ -0,0 +1,106 @@
+import pytest
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import app, create_app, db
+from rate_limit import MemoryBucketStore, SqliteBucketStore
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def client(monkeypatch, clock):
+    app.config['TESTING'] = True
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    state = app.extensions['rate_limiter']
+    monkeypatch.setattr(state, 'store', MemoryBucketStore(clock=clock))
+    monkeypatch.setitem(state.limits, 'api.login', (2 / 60, 2.0))
+    with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
+        yield client
+        db.session.remove()
+        db.drop_all()
+
+def login_user(client, email="nobody@test.com", password="pass123"):
+    return client.post('/login', json={
+        'email': email,
+        'password': password
+    })
+
+def test_memory_store_refills(clock):
+    store = MemoryBucketStore(clock=clock)
+    assert store.take("k", 1.0, 2.0) == 0
+    assert store.take("k", 1.0, 2.0) == 0
+    assert store.take("k", 1.0, 2.0) == pytest.approx(1.0)
+    clock.now += 0.5
+    assert store.take("k", 1.0, 2.0) == pytest.approx(0.5)
+    clock.now += 0.5
+    assert store.take("k", 1.0, 2.0) == 0
+
+def test_memory_store_keys_are_independent(clock):
+    store = MemoryBucketStore(clock=clock)
+    assert store.take("a", 1.0, 1.0) == 0
+    assert store.take("a", 1.0, 1.0) > 0
+    assert store.take("b", 1.0, 1.0) == 0
+
+def test_memory_store_prunes_when_full(clock):
+    store = MemoryBucketStore(stripes=1, max_keys=2, clock=clock)
+    for key in ("a", "b", "c"):
+        store.take(key, 1.0, 1.0)
+    assert sum(len(buckets) for buckets in store._buckets) == 2
+
+def test_memory_store_rejects_bad_stripes():
+    with pytest.raises(ValueError):
+        MemoryBucketStore(stripes=3)
+
+def test_sqlite_store_shared_between_instances(tmp_path, clock):
+    path = str(tmp_path / "buckets.db")
+    first = SqliteBucketStore(path, clock=clock)
+    second = SqliteBucketStore(path, clock=clock)
+    assert first.take("k", 1.0, 1.0) == 0
+    assert second.take("k", 1.0, 1.0) == pytest.approx(1.0)
+
+def test_login_rate_limited(client, clock):
+    assert login_user(client).status_code == 401
+    assert login_user(client).status_code == 401
+    response = login_user(client)
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == "30"
+    assert response.get_json()["message"] == "Too many requests"
+
+    clock.now += 30
+    assert login_user(client).status_code == 401
+
+def test_unlimited_endpoint_not_affected(client):
+    for _ in range(5):
+        assert client.get('/students').status_code == 200
+
+def test_rate_limit_disabled(client, monkeypatch):
+    monkeypatch.setitem(app.config, 'RATELIMIT_ENABLED', False)
+    for _ in range(5):
+        assert login_user(client).status_code == 401
+
+def test_create_app_uses_shared_store(tmp_path, monkeypatch):
+    path = str(tmp_path / 'buckets.db')
+    assert isinstance(create_app().extensions['rate_limiter'].store, MemoryBucketStore)
+    store = create_app({'RATELIMIT_STORAGE_PATH': path}).extensions['rate_limiter'].store
+    assert isinstance(store, SqliteBucketStore)
+
+    # Two workers of one deployment share their buckets.
+    monkeypatch.setenv('RATELIMIT_STORAGE_PATH', path)
+    limits = {'RATELIMIT_LIMITS': {'api.login': (2, 60)}}
+    workers = [create_app(limits).test_client() for _ in range(2)]
+    statuses = [client.post('/login', json={}).status_code for client in workers + workers]
+    assert statuses[-1] == 429
@@ -0,0 +1,108 @@
+import pytest
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import db, Log, Reminder, Task
+from reminders import ReminderScheduler
+
+NOW = datetime(2030, 1, 10, 12, 0)
+HOUR = timedelta(hours=1)
+
+
+def add_task(app, due_date, completed=False, content="Zadanie"):
+    with app.app_context():
+        task = Task(content=content, student_id=2, teacher_id=1, due_date=due_date, max_points=10, completed=completed)
+        db.session.add(task)
+        db.session.commit()
+        return task.id
+
+@pytest.fixture
+def events():
+    return []
+
+@pytest.fixture
+def scheduler(app, events):
+    with app.app_context():
+        return ReminderScheduler(db.engine, sink=events.extend)
+
+def sent(events):
+    return [(event["task_id"], event["lead"]) for event in events]
+
+def test_each_lead_fires_once(app, scheduler, events):
+    task_id = add_task(app, NOW + 30 * HOUR)
+    assert scheduler.tick(NOW) == 0
+    assert scheduler.tick(NOW + 6 * HOUR) == 1
+    assert scheduler.tick(NOW + 7 * HOUR) == 0
+    assert scheduler.tick(NOW + 29 * HOUR) == 1
+    assert scheduler.tick(NOW + 29.5 * HOUR) == 0
+    assert sent(events) == [(task_id, 24 * 3600), (task_id, 3600)]
+    assert events[0]["content"] == "Zadanie"
+    assert events[0]["student_id"] == 2
+
+def test_only_shortest_overdue_lead_fires(app, scheduler, events):
+    task_id = add_task(app, NOW + 0.5 * HOUR)
+    assert scheduler.tick(NOW) == 1
+    assert sent(events) == [(task_id, 3600)]
+
+def test_window_skips_completed_past_and_distant_tasks(app, scheduler):
+    add_task(app, NOW + 2 * HOUR, completed=True)
+    add_task(app, NOW - HOUR)
+    add_task(app, NOW + 30 * 24 * HOUR)
+    soon = add_task(app, NOW + 2 * HOUR)
+    assert scheduler.refill(NOW) == 2
+    assert {task_id for _, task_id, _ in scheduler._heap} == {soon}
+
+def test_other_scheduler_does_not_send_again(app, scheduler, events):
+    add_task(app, NOW + 2 * HOUR)
+    assert scheduler.tick(NOW) == 1
+    with app.app_context():
+        other = ReminderScheduler(db.engine, sink=events.extend)
+        assert other.refill(NOW) == 1
+        assert other.tick(NOW) == 0
+        assert Reminder.query.count() == 1
+
+def test_failed_sink_releases_claims(app, events):
+    def sink(batch):
+        if not events:
+            events.append(None)
+            raise ConnectionError("mail gateway down")
+        events.extend(batch)
+
+    task_id = add_task(app, NOW + 2 * HOUR)
+    with app.app_context():
+        scheduler = ReminderScheduler(db.engine, sink=sink)
+        with pytest.raises(ConnectionError):
+            scheduler.tick(NOW)
+        assert Reminder.query.count() == 0
+        # Retried after the next refill.
+        assert scheduler.tick(NOW + timedelta(seconds=scheduler.refresh)) == 1
+        assert sent(events[1:]) == [(task_id, 24 * 3600)]
+        assert Reminder.query.count() == 1
+
+def test_completed_after_load_is_not_reminded(app, scheduler):
+    task_id = add_task(app, NOW + 2 * HOUR)
+    scheduler.refresh = 3 * 3600
+    scheduler.refill(NOW - HOUR)
+    with app.app_context():
+        db.session.get(Task, task_id).completed = True
+        db.session.commit()
+    assert scheduler.tick(NOW) == 0
+
+def test_moved_due_date_is_rescheduled(app, scheduler):
+    task_id = add_task(app, NOW + 2 * HOUR)
+    scheduler.refresh = 3 * 3600
+    scheduler.refill(NOW - HOUR)
+    with app.app_context():
+        db.session.get(Task, task_id).assignment.due_date = NOW + 48 * HOUR
+        db.session.commit()
+    assert scheduler.tick(NOW) == 0
+    assert (NOW + 24 * HOUR, task_id, 24 * 3600) in scheduler._heap
+
+def test_log_sink(app):
+    add_task(app, NOW + 2 * HOUR, content="Wypracowanie")
+    with app.app_context():
+        assert ReminderScheduler(db.engine).tick(NOW) == 1
+        log = Log.query.one()
+        assert log.user_id == 2
+        assert log.action == 'Reminder: "Wypracowanie" is due 2030-01-10 14:00'
@@ -0,0 +1,123 @@
+import pytest
+import sys
+import os
+import hashlib
+from datetime import datetime, timedelta
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import db, StorageUsage, Task, UploadSession
+from resumable import expire_upload_sessions, partial_path
+
+CONTENT = bytes(range(256)) * 40
+
+
+def seed(session):
+    session.add(Task(content="Skan", student_id=2, teacher_id=1, due_date=datetime(2030, 1, 1), max_points=10))
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed)
+
+def start(client, size=len(CONTENT), **extra):
+    return client.post('/upload/1/session', json={'student_id': 2, 'filename': "skan.pdf", 'size': size, **extra})
+
+def put(client, upload_id, offset, data):
+    return client.put(f'/upload/session/{upload_id}', query_string={'offset': offset}, data=data,
+                      content_type='application/octet-stream')
+
+def test_chunked_upload(app, client):
+    response = start(client, sha256=hashlib.sha256(CONTENT).hexdigest())
+    assert response.status_code == 201
+    upload_id = response.get_json()["upload_id"]
+
+    for offset in range(0, len(CONTENT), 4000):
+        response = put(client, upload_id, offset, CONTENT[offset:offset + 4000])
+        assert response.status_code == 200
+        assert response.get_json()["offset"] == min(offset + 4000, len(CONTENT))
+
+    response = client.post(f'/upload/session/{upload_id}/complete')
+    assert response.status_code == 200
+    assert response.get_json()["filename"] == "1_2_skan.pdf"
+    with app.app_context():
+        task = db.session.get(Task, 1)
+        with open(task.file_path, 'rb') as f:
+            assert f.read() == CONTENT
+        assert task.file_size == len(CONTENT)
+        assert db.session.get(StorageUsage, 2).bytes == len(CONTENT)
+        assert not os.path.exists(partial_path(upload_id, app.config['UPLOAD_FOLDER']))
+
+    # A retried completion gets the same answer.
+    assert client.post(f'/upload/session/{upload_id}/complete').get_json()["filename"] == "1_2_skan.pdf"
+    assert put(client, upload_id, len(CONTENT), b"x").status_code == 409
+
+def test_resume_after_offset_mismatch(client):
+    upload_id = start(client).get_json()["upload_id"]
+    put(client, upload_id, 0, CONTENT[:1000])
+    response = put(client, upload_id, 0, CONTENT[:1000])
+    assert response.status_code == 409
+    assert response.get_json()["offset"] == 1000
+    assert client.get(f'/upload/session/{upload_id}').get_json()["offset"] == 1000
+
+    response = client.post(f'/upload/session/{upload_id}/complete')
+    assert response.status_code == 409
+    assert response.get_json()["message"] == "Upload incomplete"
+
+def test_chunk_larger_than_file_rejected(client):
+    upload_id = start(client, size=10).get_json()["upload_id"]
+    assert put(client, upload_id, 0, b"x" * 11).status_code == 413
+    assert put(client, upload_id, 0, b"x" * 10).status_code == 200
+
+def test_checksum_mismatch(app, client):
+    upload_id = start(client, size=4, sha256=hashlib.sha256(b"abcd").hexdigest()).get_json()["upload_id"]
+    put(client, upload_id, 0, b"abce")
+    assert client.post(f'/upload/session/{upload_id}/complete').status_code == 422
+    assert client.get(f'/upload/session/{upload_id}').status_code == 404
+    with app.app_context():
+        assert db.session.get(Task, 1).file_path is None
+
+def test_session_validation(client):
+    assert client.post('/upload/1/session', json={'filename': "a.pdf", 'size': 1}).status_code == 400
+    assert client.post('/upload/1/session', json={'student_id': 1, 'filename': "a.pdf", 'size': 1}).status_code == 404
+    assert start(client, size=0).status_code == 400
+    assert client.post('/upload/1/session', json={'student_id': 2, 'filename': "a.exe", 'size': 1}).status_code == 400
+    assert start(client, size=200 * 1024 * 1024).status_code == 413
+
+def test_cancel(app, client):
+    upload_id = start(client).get_json()["upload_id"]
+    assert client.delete(f'/upload/session/{upload_id}').status_code == 200
+    assert not os.path.exists(partial_path(upload_id, app.config['UPLOAD_FOLDER']))
+    assert put(client, upload_id, 0, b"x").status_code == 404
+
+def test_stale_sessions_expire(app, client):
+    upload_id = start(client).get_json()["upload_id"]
+    put(client, upload_id, 0, CONTENT[:100])
+    folder = app.config['UPLOAD_FOLDER']
+    with app.app_context():
+        assert expire_upload_sessions(db.engine, folder, ttl=3600) == 0
+        later = datetime.now() + timedelta(days=2)
+        assert expire_upload_sessions(db.engine, folder, ttl=3600, now=later) == 1
+        assert UploadSession.query.count() == 0
+    assert client.get(f'/upload/session/{upload_id}').status_code == 404
+
+def test_single_shot_upload_still_works(client):
+    from io import BytesIO
+    response = client.post('/upload/1', data={'student_id': '2', 'file': (BytesIO(b"abc"), 'praca.txt')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 200
+
+def test_dropped_connection_keeps_received_bytes(tmp_path):
+    from io import BytesIO
+    from werkzeug.exceptions import ClientDisconnected
+    from resumable import append_chunk
+
+    class DroppedStream(BytesIO):
+        def read(self, size=-1):
+            data = super().read(size)
+            if not data:
+                raise ClientDisconnected()
+            return data
+
+    path = tmp_path / "partial"
+    path.write_bytes(b"")
+    assert append_chunk(str(path), 0, DroppedStream(b"abc"), 10) == (3, False)
+    assert append_chunk(str(path), 3, BytesIO(b"defg"), 7) == (4, True)
+    assert path.read_bytes() == b"abcdefg"
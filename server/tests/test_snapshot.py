@@ -0,0 +1,120 @@
+import pytest
+import sys
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import db, Task, User
+from snapshot import restore_snapshot, take_snapshot
+
+
+def seed(session):
+    session.add_all([Task(content=f"Zadanie {i}", student_id=3, teacher_id=2,
+                          due_date=datetime(2030, 1, 1), max_points=10) for i in range(50)])
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    return make_app(seed, roles=('admin', 'teacher', 'student'), SNAPSHOT_FOLDER=str(tmp_path / 'snapshots'))
+
+def test_snapshot_and_restore(app, tmp_path):
+    path = str(tmp_path / 'seed.db')
+    with app.app_context():
+        assert take_snapshot(db.engine, path) > 0
+        Task.query.filter(Task.id > 10).delete()
+        db.session.commit()
+        assert Task.query.count() == 10
+
+        restore_snapshot(db.engine, path)
+        db.session.remove()
+        assert Task.query.count() == 50
+        assert not os.path.exists(f"{path}.tmp")
+
+def test_snapshot_does_not_block_readers(app, tmp_path):
+    with app.app_context():
+        database = db.engine.url.database
+        engine = db.engine
+    reader = sqlite3.connect(database)
+    try:
+        reader.execute("BEGIN")
+        assert reader.execute("SELECT count(*) FROM task").fetchone() == (50,)
+        take_snapshot(engine, str(tmp_path / 'during-read.db'))
+        assert reader.execute("SELECT count(*) FROM task").fetchone() == (50,)
+    finally:
+        reader.close()
+
+def test_snapshot_during_writes(app, tmp_path):
+    with app.app_context():
+        database = db.engine.url.database
+        engine = db.engine
+        # Larger than one step of the stepped backup API, which started over
+        # after every commit in between.
+        with engine.begin() as conn:
+            conn.exec_driver_sql("CREATE TABLE filler (data BLOB)")
+            conn.exec_driver_sql("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 32) "
+                                 "INSERT INTO filler SELECT randomblob(1048576) FROM n")
+    stop, commits, errors = threading.Event(), [], []
+
+    def write():
+        writer = sqlite3.connect(database, timeout=10)
+        try:
+            while not stop.is_set():
+                writer.execute("UPDATE task SET answer = ? WHERE id = 1", (str(len(commits)),))
+                writer.commit()
+                commits.append(1)
+                time.sleep(0.001)
+        except sqlite3.Error as exc:
+            errors.append(exc)
+        finally:
+            writer.close()
+
+    thread = threading.Thread(target=write)
+    thread.start()
+    try:
+        while not commits:
+            time.sleep(0.001)
+        path = str(tmp_path / 'busy.db')
+        snapshot = threading.Thread(target=take_snapshot, args=(engine, path), daemon=True)
+        snapshot.start()
+        snapshot.join(timeout=10)
+        assert not snapshot.is_alive()
+        committed = len(commits)
+        time.sleep(0.05)
+        assert len(commits) > committed
+    finally:
+        stop.set()
+        thread.join()
+    assert errors == []
+    copy = sqlite3.connect(path)
+    try:
+        assert copy.execute("SELECT count(*) FROM task").fetchone() == (50,)
+    finally:
+        copy.close()
+
+def test_snapshot_endpoints(app, client):
+    response = client.post('/snapshots', json={'admin_id': 1, 'name': "seed"})
+    assert response.status_code == 201
+    assert response.get_json()["size"] > 0
+    assert [snapshot["name"] for snapshot in client.get('/snapshots?admin_id=1').get_json()] == ["seed"]
+
+    client.post('/clear_db')
+    with app.app_context():
+        db.session.add(User(name="Ada", surname="Admin", email="a@test.com", password="x", role="admin"))
+        db.session.commit()
+        assert Task.query.count() == 0
+
+    response = client.post('/snapshots/seed/restore', json={'admin_id': 1})
+    assert response.status_code == 200
+    with app.app_context():
+        assert Task.query.count() == 50
+
+def test_snapshot_endpoints_require_admin(client):
+    assert client.post('/snapshots', json={'admin_id': 2, 'name': "seed"}).status_code == 403
+    assert client.post('/snapshots', json={'name': "seed"}).status_code == 403
+    assert client.get('/snapshots').status_code == 403
+    assert client.post('/snapshots/seed/restore', json={'admin_id': 3}).status_code == 403
+
+def test_snapshot_name_and_missing_snapshot(client):
+    assert client.post('/snapshots', json={'admin_id': 1, 'name': "../etc"}).status_code == 400
+    assert client.post('/snapshots/nope/restore', json={'admin_id': 1}).status_code == 404
@@ -0,0 +1,86 @@
+import pytest
+import sys
+import os
+import time
+from io import BytesIO
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import db, StorageUsage, Task, User
+from archive import archive_graded_tasks
+from storage import collect_garbage, rebuild_storage_usage
+
+
+def seed(session):
+    session.add(User(name="Piotr", surname="Wisniewski", email="p@test.com", password="x", role="student"))
+    for student_id in (2, 2, 3):
+        session.add(Task(content="Zadanie", student_id=student_id, teacher_id=1,
+                         due_date=datetime(2024, 1, 1), max_points=10))
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed)
+
+def upload(client, task_id, student_id, content, name='praca.txt'):
+    return client.post(f'/upload/{task_id}', data={
+        'student_id': str(student_id), 'file': (BytesIO(content), name)
+    }, content_type='multipart/form-data')
+
+def usage(client, user_id):
+    data = client.get('/storage', query_string={'user_id': user_id}).get_json()
+    return data["bytes"], data["files"]
+
+def test_usage_tracked_per_student_and_teacher(client):
+    assert usage(client, 2) == (0, 0)
+    upload(client, 1, 2, b"12345")
+    upload(client, 2, 2, b"123")
+    upload(client, 3, 3, b"1234567")
+    assert usage(client, 2) == (8, 2)
+    assert usage(client, 3) == (7, 1)
+    assert usage(client, 1) == (15, 3)
+
+    # A new upload replaces the task's file in the totals.
+    upload(client, 1, 2, b"1", name='poprawka.txt')
+    assert usage(client, 2) == (4, 2)
+    assert usage(client, 1) == (11, 3)
+
+def test_usage_errors(client):
+    assert client.get('/storage').status_code == 400
+    assert client.get('/storage', query_string={'user_id': 99}).status_code == 404
+
+def test_rebuild_matches_incremental_totals(app, client):
+    upload(client, 1, 2, b"12345")
+    upload(client, 1, 2, b"12", name='poprawka.txt')
+    upload(client, 3, 3, b"1234567")
+    with app.app_context():
+        before = {row.user_id: (row.bytes, row.files) for row in StorageUsage.query}
+        rebuild_storage_usage(db.engine)
+        db.session.expire_all()
+        assert {row.user_id: (row.bytes, row.files) for row in StorageUsage.query} == before
+
+def test_gc_removes_replaced_and_orphaned_files(app, client):
+    upload(client, 1, 2, b"stara", name='stara.txt')
+    upload(client, 1, 2, b"nowa", name='nowa.txt')
+    folder = app.config['UPLOAD_FOLDER']
+    with open(os.path.join(folder, 'sierota.txt'), 'wb') as f:
+        f.write(b"x")
+    os.makedirs(os.path.join(folder, 'szkola-a'))
+
+    with app.app_context():
+        assert collect_garbage(db.engine, folder, grace=3600) == ([], 0)
+        removed, freed = collect_garbage(db.engine, folder, grace=0, dry_run=True, now=time.time() + 1)
+        assert sorted(removed) == ['1_2_stara.txt', 'sierota.txt']
+        assert len(os.listdir(folder)) == 4
+
+        removed, freed = collect_garbage(db.engine, folder, grace=0, now=time.time() + 1)
+        assert (sorted(removed), freed) == (['1_2_stara.txt', 'sierota.txt'], 6)
+        assert sorted(os.listdir(folder)) == ['1_2_nowa.txt', 'szkola-a']
+
+def test_gc_keeps_archived_files(app, client):
+    upload(client, 1, 2, b"praca")
+    with app.app_context():
+        task = db.session.get(Task, 1)
+        task.completed, task.grade = True, 8
+        db.session.commit()
+        assert archive_graded_tasks(db.engine, datetime(2025, 1, 1)) == 1
+        assert collect_garbage(db.engine, app.config['UPLOAD_FOLDER'], grace=0, now=time.time() + 1) == ([], 0)
+    assert usage(client, 2) == (5, 1)
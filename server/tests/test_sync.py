@@ -0,0 +1,131 @@
+import pytest
+import sys
+import os
+import io
+from datetime import datetime
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import sqlalchemy as sa
+from app import create_app, db, bump_change_seq, NEXT_CHANGE_SEQ, Task, User
+
+
+def seed(session):
+    session.add(User(name="Ewa", surname="Nowak", email="s2@test.com", password="x", role="student"))
+    for student_id in (2, 2, 3):
+        session.add(Task(content="Task", student_id=student_id, teacher_id=1, due_date=datetime.now(), max_points=10))
+
+@pytest.fixture
+def app(make_app):
+    return make_app(seed)
+
+def changes(client, user_id, role, since, **params):
+    response = client.get('/tasks/changes', query_string={'user_id': user_id, 'role': role, 'since': since, **params})
+    assert response.status_code == 200
+    return response.get_json()
+
+def test_initial_sync_returns_all_tasks(client):
+    data = changes(client, 1, 'teacher', 0)
+    assert [task['id'] for task in data['tasks']] == [1, 2, 3]
+    assert data['cursor'] > 0
+    assert data['has_more'] is False
+
+def test_student_sees_only_own_tasks(client):
+    data = changes(client, 2, 'student', 0)
+    assert [task['id'] for task in data['tasks']] == [1, 2]
+    assert data['tasks'][0]['teacher_name'] == "Jan Nowak"
+
+def test_no_changes_keeps_cursor(client):
+    cursor = changes(client, 1, 'teacher', 0)['cursor']
+    data = changes(client, 1, 'teacher', cursor)
+    assert data['tasks'] == []
+    assert data['cursor'] == cursor
+
+def test_mutating_routes_advance_cursor(client):
+    cursor = changes(client, 1, 'teacher', 0)['cursor']
+
+    client.post('/task/complete/2', json={'student_id': 2, 'answer': "42"})
+    data = changes(client, 1, 'teacher', cursor)
+    assert [task['id'] for task in data['tasks']] == [2]
+    assert data['tasks'][0]['completed'] is True
+    cursor = data['cursor']
+
+    client.post('/task/grade/2', json={'teacher_id': 1, 'grade': 9})
+    data = changes(client, 2, 'student', cursor)
+    assert [(task['id'], task['grade']) for task in data['tasks']] == [(2, 9)]
+    cursor = data['cursor']
+
+    client.post('/upload/1', data={'file': (io.BytesIO(b"x"), 'a.txt'), 'student_id': 2},
+                content_type='multipart/form-data')
+    data = changes(client, 1, 'teacher', cursor)
+    assert [task['id'] for task in data['tasks']] == [1]
+    cursor = data['cursor']
+
+    client.post('/tasks', json={'teacher_id': 1, 'student_id': 3, 'content': "New",
+                                'due_date': "2030-01-01", 'max_points': 5})
+    data = changes(client, 3, 'student', cursor)
+    assert [task['content'] for task in data['tasks']] == ["New"]
+
+def test_paging_with_limit(client):
+    first = changes(client, 1, 'teacher', 0, limit=2)
+    assert [task['id'] for task in first['tasks']] == [1, 2]
+    assert first['has_more'] is True
+    second = changes(client, 1, 'teacher', first['cursor'], limit=2)
+    assert [task['id'] for task in second['tasks']] == [3]
+    assert second['has_more'] is False
+
+def test_invalid_parameters(client):
+    assert client.get('/tasks/changes').status_code == 400
+    response = client.get('/tasks/changes', query_string={'user_id': 1, 'role': 'teacher', 'since': 'x'})
+    assert response.status_code == 400
+    response = client.get('/tasks/changes', query_string={'user_id': 1, 'role': 'admin'})
+    assert response.status_code == 400
+
+def test_unchanged_dirty_task_does_not_bump(app):
+    with app.app_context():
+        task = db.session.get(Task, 1)
+        seq = task.change_seq
+        task.answer = "draft"
+        task.answer = None
+        assert task in db.session.dirty
+        db.session.commit()
+        assert db.session.get(Task, 1).change_seq == seq
+
+def test_changes_query_uses_index(app):
+    with app.app_context():
+        plan = db.session.execute(sa.text(
+            "EXPLAIN QUERY PLAN SELECT * FROM task WHERE teacher_id = 1 AND change_seq > 5 ORDER BY change_seq"
+        )).all()
+    assert any('ix_task_teacher_change_seq' in row[-1] for row in plan)
+
+def test_postgresql_writers_take_the_change_seq_lock():
+    from sqlalchemy.dialects import postgresql
+
+    class Connection:
+        dialect = postgresql.dialect()
+        statements = []
+
+        def execute(self, statement):
+            self.statements.append(str(statement.compile(dialect=self.dialect)))
+
+    connection = Connection()
+    bump_change_seq(None, connection, Task())
+    assert len(connection.statements) == 1
+    assert connection.statements[0].startswith("SELECT pg_advisory_xact_lock(")
+    assert 'greatest(' in str(NEXT_CHANGE_SEQ.compile(dialect=connection.dialect))
+
+def test_upgrade_adds_change_seq_to_old_schema(tmp_path):
+    from migrations import upgrade
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'old.db'}"})
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            conn.execute(sa.text("DROP INDEX ix_task_change_seq"))
+            conn.execute(sa.text("DROP INDEX ix_task_student_change_seq"))
+            conn.execute(sa.text("DROP INDEX ix_task_teacher_change_seq"))
+            conn.execute(sa.text("ALTER TABLE task DROP COLUMN change_seq"))
+            conn.execute(sa.text("INSERT INTO assignment (teacher_id, content, change_seq) VALUES (1, 'a', 0)"))
+            conn.execute(sa.text("INSERT INTO task (assignment_id, student_id, teacher_id) VALUES (1, 1, 1), (1, 2, 1)"))
+
+        assert upgrade() == ['add_task_change_seq', 'create_missing_indexes']
+        assert upgrade() == []
+        assert [task.change_seq for task in Task.query.order_by(Task.id)] == [1, 2]
+        db.engine.dispose()
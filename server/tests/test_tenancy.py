@@ -0,0 +1,157 @@
+import pytest
+import sys
+import os
+import io
+import json
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from app import create_app, db
+from tenancy import create_shard, move_tenant
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = create_app({
+        'TESTING': True,
+        'RATELIMIT_ENABLED': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'default.db'}",
+        'TENANT_SHARD_MAP': str(tmp_path / 'shards.json'),
+        'UPLOAD_FOLDER': str(tmp_path / 'uploads'),
+        'PROFILE_FOLDER': str(tmp_path / 'profiles'),
+    })
+    create_shard(app, 'szkola-a', f"sqlite:///{tmp_path / 'a.db'}")
+    create_shard(app, 'szkola-b', f"sqlite:///{tmp_path / 'b.db'}")
+    yield app
+    app.extensions['tenancy'].dispose()
+    with app.app_context():
+        db.engine.dispose()
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+def register_user(client, school, email, role="student"):
+    return client.post('/register', headers={'X-School': school}, json={
+        'name': "Jan",
+        'surname': "Nowak",
+        'email': email,
+        'password': "pass123",
+        'role': role
+    })
+
+def students(client, school):
+    return client.get('/students', headers={'X-School': school}).get_json()
+
+def test_schools_are_isolated(client):
+    assert register_user(client, 'szkola-a', "a@test.com").status_code == 201
+    assert register_user(client, 'szkola-b', "b1@test.com").status_code == 201
+    assert register_user(client, 'szkola-b', "b2@test.com").status_code == 201
+    assert len(students(client, 'szkola-a')) == 1
+    assert len(students(client, 'szkola-b')) == 2
+    # the same email may exist in two schools
+    assert register_user(client, 'szkola-a', "b1@test.com").status_code == 201
+
+def test_default_database_untouched(app, client):
+    register_user(client, 'szkola-a', "a@test.com")
+    from sqlalchemy import inspect
+    with app.app_context():
+        assert not inspect(db.engine).has_table('user')
+
+def test_missing_or_unknown_school(client):
+    response = client.get('/students')
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Missing school header"
+    response = client.get('/students', headers={'X-School': 'nieznana'})
+    assert response.status_code == 404
+    assert client.options('/students').status_code == 200
+
+def test_login_does_not_cross_schools(client):
+    register_user(client, 'szkola-a', "a@test.com")
+    client.post('/login', headers={'X-School': 'szkola-a'}, json={'email': "a@test.com", 'password': "pass123"})
+    with client.session_transaction() as session:
+        assert session['_user_id'] == '1'
+    students(client, 'szkola-b')
+    with client.session_transaction() as session:
+        assert '_user_id' not in session
+        assert session['_tenant'] == 'szkola-b'
+
+def test_uploads_go_to_school_folder(app, client):
+    register_user(client, 'szkola-a', "t@test.com", role="teacher")
+    register_user(client, 'szkola-a', "s@test.com")
+    client.post('/tasks', headers={'X-School': 'szkola-a'}, json={
+        'teacher_id': 1, 'student_id': 2, 'content': "x", 'due_date': "2030-01-01", 'max_points': 5})
+    response = client.post('/upload/1', headers={'X-School': 'szkola-a'}, content_type='multipart/form-data',
+                           data={'file': (io.BytesIO(b"abc"), 'a.txt'), 'student_id': 2})
+    assert response.status_code == 200
+    filename = response.get_json()["filename"]
+    assert os.path.exists(os.path.join(app.config['UPLOAD_FOLDER'], 'szkola-a', filename))
+    assert client.get(f'/uploads/{filename}', headers={'X-School': 'szkola-a'}).data == b"abc"
+    assert client.get(f'/uploads/{filename}', headers={'X-School': 'szkola-b'}).status_code == 404
+
+def test_move_tenant(app, client, tmp_path):
+    register_user(client, 'szkola-a', "a1@test.com")
+    register_user(client, 'szkola-a', "a2@test.com")
+    copied = move_tenant(app, 'szkola-a', f"sqlite:///{tmp_path / 'moved' / 'a.db'}", settle=0)
+    assert copied['user'] == 2
+    assert copied['log'] == 2
+    with open(tmp_path / 'shards.json') as f:
+        assert json.load(f)['szkola-a'] == {"uri": f"sqlite:///{tmp_path / 'moved' / 'a.db'}", "read_only": False}
+    assert len(students(client, 'szkola-a')) == 2
+    assert register_user(client, 'szkola-a', "a3@test.com").status_code == 201
+
+def test_move_into_non_empty_database_rolls_back(app, client, tmp_path):
+    register_user(client, 'szkola-a', "a@test.com")
+    register_user(client, 'szkola-b', "b@test.com")
+    with pytest.raises(Exception):
+        move_tenant(app, 'szkola-a', f"sqlite:///{tmp_path / 'b.db'}", settle=0)
+    assert app.extensions['tenancy'].shards.get('szkola-a') == {"uri": f"sqlite:///{tmp_path / 'a.db'}", "read_only": False}
+
+def test_writes_refused_while_moving(app, client):
+    shards = app.extensions['tenancy'].shards
+    schools = dict(shards.schools)
+    schools['szkola-a'] = {**schools['szkola-a'], "read_only": True}
+    shards.save(schools)
+    response = register_user(client, 'szkola-a', "a@test.com")
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+    assert students(client, 'szkola-a') == []
+
+def test_invalid_school_name(app):
+    with pytest.raises(ValueError):
+        create_shard(app, '../etc')
+    with pytest.raises(ValueError):
+        create_shard(app, 'szkola-a')
+    with pytest.raises(ValueError, match="Unsupported database"):
+        create_shard(app, 'szkola-c', "mysql://user@localhost/szkola_c")
+
+def test_clear_db_clears_only_the_school(client):
+    register_user(client, 'szkola-a', "a@test.com")
+    register_user(client, 'szkola-b', "b@test.com")
+    response = client.post('/clear_db', headers={'X-School': 'szkola-a'})
+    assert response.status_code == 200
+    assert students(client, 'szkola-a') == []
+    assert len(students(client, 'szkola-b')) == 1
+
+def test_rate_limits_are_per_school(app, client):
+    app.config['RATELIMIT_ENABLED'] = True
+    app.extensions['rate_limiter'].limits['api.get_tasks'] = (1 / 60, 1.0)
+    login = {'email': "a@test.com", 'password': "pass123"}
+    tasks = '/tasks?user_id=1&role=student'
+    # User 1 of school a uses up its bucket, user 1 of school b still has one.
+    for school, statuses in (('szkola-a', [200, 429]), ('szkola-b', [200])):
+        register_user(client, school, "a@test.com")
+        client.post('/login', headers={'X-School': school}, json=login)
+        assert [client.get(tasks, headers={'X-School': school}).status_code for _ in statuses] == statuses
+
+def test_profiles_are_per_school(client):
+    for school in ('szkola-a', 'szkola-b'):
+        register_user(client, school, "admin@test.com", role="admin")
+    response = client.get('/tasks?user_id=1&role=student', headers={'X-School': 'szkola-b', 'X-Profile': '1'})
+    profile_id = response.headers['X-Profile-Id']
+
+    def profiles(school):
+        return client.get('/profiles?admin_id=1', headers={'X-School': school}).get_json()
+
+    assert [profile["id"] for profile in profiles('szkola-b')] == [profile_id]
+    assert profiles('szkola-a') == []
+    response = client.get(f'/profiles/{profile_id}?admin_id=1', headers={'X-School': 'szkola-a'})
+    assert response.status_code == 404
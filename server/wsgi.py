@@ -0,0 +1,3 @@
+from app import app
+
+# gunicorn -c gunicorn.conf.py  (see gunicorn.conf.py for the worker setup)